@@ -0,0 +1,4 @@
+from time import monotonic
+
+# when importing the service tests started, for the cold start report
+_import_start = monotonic()
@@ -0,0 +1,70 @@
+"""Resource budgets for service tests
+
+Budgets are set as class attributes on a `NioServiceTestCase` or per test
+method with the `budget` decorator, and are checked when the test is torn
+down.
+"""
+# The budgets a test can set
+BUDGETS = ('max_wall_time', 'max_peak_memory', 'max_block_time',
+           'max_deepcopies')
+# Attribute a decorated test method keeps its budgets on
+BUDGET_ATTRIBUTE = '_service_test_budgets'
+
+
+def budget(**limits):
+    """Set resource budgets for a single test method.
+
+    These take precedence over the budgets set as class attributes.
+
+    Example:
+        @budget(max_wall_time=0.5, max_block_time={'filter': 0.1})
+        def test_service(self):
+            ...
+
+    Raises:
+        TypeError: If an unknown budget is given
+    """
+    unknown = set(limits) - set(BUDGETS)
+    if unknown:
+        raise TypeError('Unknown budgets: {}. Valid budgets are: {}'
+                        .format(sorted(unknown), list(BUDGETS)))
+
+    def set_budgets(test_method):
+        setattr(test_method, BUDGET_ATTRIBUTE, limits)
+        return test_method
+    return set_budgets
+
+
+def budget_violations(budgets, usage):
+    """Compare measured resource usage against budgets.
+
+    Args:
+        budgets (dict): budget name to limit, None means no limit
+        usage (dict): measured usage with the keys `wall_time`,
+            `peak_memory`, `block_times` and `deepcopies`
+
+    Returns:
+        list: a description of every exceeded budget
+    """
+    violations = []
+    if budgets.get('max_wall_time') is not None and \
+            usage['wall_time'] > budgets['max_wall_time']:
+        violations.append('wall time {:.4f}s exceeded budget of {}s'.format(
+            usage['wall_time'], budgets['max_wall_time']))
+    if budgets.get('max_peak_memory') is not None and \
+            usage['peak_memory'] > budgets['max_peak_memory']:
+        violations.append('peak memory {} bytes exceeded budget of {} bytes'
+                          .format(usage['peak_memory'],
+                                  budgets['max_peak_memory']))
+    for block, limit in (budgets.get('max_block_time') or {}).items():
+        block_time = usage['block_times'].get(block, 0)
+        if block_time > limit:
+            violations.append(
+                'block {} processing time {:.4f}s exceeded budget of {}s'
+                .format(block, block_time, limit))
+    if budgets.get('max_deepcopies') is not None and \
+            usage['deepcopies'] > budgets['max_deepcopies']:
+        violations.append('{} signal deep copies exceeded budget of {}'
+                          .format(usage['deepcopies'],
+                                  budgets['max_deepcopies']))
+    return violations
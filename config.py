@@ -0,0 +1,89 @@
+"""Effective block configurations
+
+A service block's configuration is its block config with the test's
+overrides applied and environment variables replaced. The result only
+depends on those three inputs, so it is computed once per distinct content
+and kept frozen, which lets every test that uses the same configuration
+share it without one block's changes leaking into another's.
+"""
+import hashlib
+import json
+import re
+from types import MappingProxyType
+
+# Frozen configurations by content hash
+_effective_configs = {}
+# Forget every configuration once this many are cached
+MAX_CACHED_CONFIGS = 4096
+
+
+def freeze(value):
+    """An immutable copy of a configuration, dicts become read only
+    mappings and lists become tuples"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType(
+            {key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """A mutable copy of a frozen configuration, as blocks expect it"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+def config_hash(*parts):
+    """A hash of the content of configurations"""
+    return hashlib.sha1(json.dumps(
+        parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def replace_env_var(config, name, value):
+    """Return a copy of config with [[name]] replaced by value in every
+    string, config itself is not changed"""
+    pattern = re.compile("\\[\\[\\s*" + re.escape(name) + "\\s*\\]\\]")
+    # escape backslashes for re.sub, e.g. in Windows paths
+    replacement = str(value).replace('\\', '\\\\')
+
+    def replace(item):
+        if isinstance(item, str):
+            return pattern.sub(replacement, item)
+        if isinstance(item, (dict, MappingProxyType)):
+            return {key: replace(sub_item) for key, sub_item in item.items()}
+        if isinstance(item, (list, tuple)):
+            return [replace(sub_item) for sub_item in item]
+        return item
+    return replace(config)
+
+
+def effective_config(block_config, overrides=None, env_vars=None):
+    """The configuration a block is configured with
+
+    Args:
+        block_config (dict): the block's configuration
+        overrides (dict): properties replacing those of block_config
+        env_vars (dict): environment variable names to values
+
+    Returns:
+        (str, MappingProxyType): a hash of the inputs and the frozen
+            configuration, the same configuration is returned for the
+            same inputs
+    """
+    overrides = overrides or {}
+    env_vars = env_vars or {}
+    key = config_hash(block_config, overrides, env_vars)
+    config = _effective_configs.get(key)
+    if config is None:
+        config = dict(block_config)
+        config.update(overrides)
+        for name, value in env_vars.items():
+            config = replace_env_var(config, name, value)
+        if len(_effective_configs) >= MAX_CACHED_CONFIGS:
+            _effective_configs.clear()
+        config = _effective_configs[key] = freeze(config)
+    return key, config
@@ -0,0 +1,215 @@
+"""Signal fixture factories
+
+Build large batches of test signals from columnar data without creating a
+`Signal` per row up front. A `SignalBatch` keeps one list per attribute and
+hands out lightweight `SignalRow` views, real signals are only created when
+the batch is published or notified into the service.
+"""
+import csv
+import json
+
+from nio.signal.base import Signal
+
+
+class _Missing(object):
+    """Placeholder for rows that don't have a value for a column"""
+
+    def __repr__(self):
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+def _signal_attributes(signal):
+    """The visible attributes of a signal as a dict"""
+    attributes = getattr(signal, '__dict__', None)
+    if attributes is None:
+        # e.g. a SignalRow
+        return signal.to_dict()
+    return {name: value for name, value in attributes.items()
+            if not name.startswith('_')}
+
+
+class SignalRow(object):
+    """A read-only view of a single row in a SignalBatch
+
+    Attributes are looked up in the batch's columns, so a row costs two
+    references no matter how many attributes the signal has.
+    """
+
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    def __getattr__(self, name):
+        column = self._batch._columns.get(name)
+        if column is None or column[self._index] is MISSING:
+            raise AttributeError(name)
+        return column[self._index]
+
+    def to_dict(self):
+        """Dictionary of this row's attributes, same as Signal.to_dict"""
+        index = self._index
+        return {name: column[index]
+                for name, column in self._batch._columns.items()
+                if column[index] is not MISSING}
+
+    def to_signal(self):
+        """Create a nio Signal from this row"""
+        signal = Signal()
+        # column names are validated when the batch is built, so skip the
+        # per attribute checks Signal.from_dict does
+        signal.__dict__.update(self.to_dict())
+        return signal
+
+    def __repr__(self):
+        return 'SignalRow({})'.format(self.to_dict())
+
+
+class SignalBatch(object):
+    """A batch of signals stored as columns
+
+    Args:
+        columns (dict): maps attribute names to equally long lists of values.
+            Use MISSING for rows that should not have the attribute.
+
+    Raises:
+        ValueError: If the columns are not all the same length or a column
+            name is not a valid signal attribute name
+    """
+
+    def __init__(self, columns):
+        self._columns = {}
+        self._length = None
+        for name, values in columns.items():
+            if not name or not isinstance(name, str):
+                raise ValueError(
+                    'Invalid signal attribute name: {!r}'.format(name))
+            values = list(values)
+            if self._length is None:
+                self._length = len(values)
+            elif len(values) != self._length:
+                raise ValueError(
+                    'Column {} has {} values, expected {}'.format(
+                        name, len(values), self._length))
+            self._columns[name] = values
+        self._length = self._length or 0
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build a batch from a dict of lists"""
+        return cls(columns)
+
+    @classmethod
+    def from_dicts(cls, rows):
+        """Build a batch from an iterable of dictionaries. Rows don't need to
+        share the same keys."""
+        columns = {}
+        length = 0
+        for row in rows:
+            for name, value in row.items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = [MISSING] * length
+                column.append(value)
+            length += 1
+            if len(row) < len(columns):
+                for column in columns.values():
+                    if len(column) < length:
+                        column.append(MISSING)
+        return cls(columns)
+
+    @classmethod
+    def from_signals(cls, signals):
+        """Build a batch from existing signals. Attributes are read from the
+        signal's __dict__, leaving out hidden ones like Signal.to_dict does
+        but without its per attribute lookups."""
+        return cls.from_dicts(_signal_attributes(signal) for signal in signals)
+
+    @classmethod
+    def from_csv(cls, csv_file, converters=None, **reader_kwargs):
+        """Build a batch from a CSV file with a header row.
+
+        Args:
+            csv_file (str/file): path to a CSV file or an open file
+            converters (dict): optional mapping of column name to a callable
+                that converts the string values of that column, e.g. int
+            reader_kwargs: passed on to csv.reader
+        """
+        if isinstance(csv_file, str):
+            with open(csv_file, newline='') as opened_file:
+                return cls.from_csv(opened_file, converters, **reader_kwargs)
+        reader = csv.reader(csv_file, **reader_kwargs)
+        header = next(reader, [])
+        # transpose the rows into columns in one pass
+        columns = [list(column) for column in zip(*reader)] or \
+            [[] for _ in header]
+        converters = converters or {}
+        for index, name in enumerate(header):
+            if name in converters:
+                columns[index] = [converters[name](value)
+                                  for value in columns[index]]
+        return cls(dict(zip(header, columns)))
+
+    @classmethod
+    def from_jsonl(cls, jsonl_file):
+        """Build a batch from a JSON Lines file, one JSON object per line.
+
+        Args:
+            jsonl_file (str/file): path to a JSON Lines file or an open file
+        """
+        if isinstance(jsonl_file, str):
+            with open(jsonl_file) as opened_file:
+                return cls.from_jsonl(opened_file)
+        return cls.from_dicts(json.loads(line) for line in jsonl_file
+                              if line.strip())
+
+    @classmethod
+    def from_numpy(cls, array):
+        """Build a batch from a NumPy structured array or a dict of arrays.
+
+        Values are converted to native Python types, NumPy itself is not
+        imported here.
+        """
+        if isinstance(array, dict):
+            return cls({name: values.tolist()
+                        for name, values in array.items()})
+        return cls({name: array[name].tolist()
+                    for name in array.dtype.names})
+
+    @property
+    def columns(self):
+        """The attribute names in this batch"""
+        return list(self._columns)
+
+    def column(self, name):
+        """The values of a single attribute for every row"""
+        return self._columns[name]
+
+    def to_signals(self):
+        """Create a nio Signal for every row in the batch"""
+        return [row.to_signal() for row in self]
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield SignalRow(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SignalBatch({name: values[index]
+                                for name, values in self._columns.items()})
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('SignalBatch index out of range')
+        return SignalRow(self, index)
+
+    def __repr__(self):
+        return 'SignalBatch({} signals, columns={})'.format(
+            self._length, self.columns)
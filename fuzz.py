@@ -0,0 +1,332 @@
+"""Schema driven fuzz testing of services
+
+Signals are generated from the JSON schema of a topic in `topic_schema.json`
+using a few profiles that stress different input shapes (huge lists, deep
+nesting, long strings). Throughput is recorded per shape so inputs that are
+much slower to process than the rest stand out, and failing inputs are
+shrunk to a small example.
+"""
+from collections import namedtuple
+import random
+import string
+
+# Size ranges used when the schema doesn't constrain a value. depth is how
+# deep values without a schema type are nested.
+PROFILES = {
+    'typical': {'list_length': (0, 5), 'string_length': (0, 20),
+                'depth': 2, 'extra_properties': (0, 3)},
+    'huge_lists': {'list_length': (1000, 5000), 'string_length': (0, 20),
+                   'depth': 1, 'extra_properties': (0, 3)},
+    'deep': {'list_length': (1, 1), 'string_length': (0, 20),
+             'depth': 50, 'extra_properties': (1, 1)},
+    'long_strings': {'list_length': (0, 5),
+                     'string_length': (10000, 100000),
+                     'depth': 1, 'extra_properties': (0, 3)},
+}
+# Recursive schemas stop generating optional values past this depth
+MAX_DEPTH = 100
+
+ShapeTiming = namedtuple('ShapeTiming', 'profile, shape, signals, seconds')
+
+
+class SchemaSignalGenerator(object):
+    """Generate signal dictionaries that follow a JSON schema
+
+    Supports the common validation keywords: type, enum, const, properties,
+    required, additionalProperties, min/maxProperties, items, min/maxItems,
+    min/maxLength, minimum/maximum (and exclusive), anyOf, oneOf, allOf and
+    local $ref. Other keywords, like pattern, are ignored so generated values
+    should still be validated.
+
+    Args:
+        root_schema (dict): the schema $refs are resolved against
+        seed: seed for the random generator, to reproduce a run
+    """
+
+    def __init__(self, root_schema, seed=None):
+        self.root_schema = root_schema
+        self.random = random.Random(seed)
+
+    def generate(self, schema, profile='typical'):
+        """Generate one value for the schema using the given profile"""
+        return self._generate(schema, PROFILES[profile], 0)
+
+    def _resolve(self, schema):
+        while isinstance(schema, dict) and '$ref' in schema:
+            ref = schema['$ref']
+            if not ref.startswith('#'):
+                # only references within the schema file are supported
+                return {}
+            schema = self.root_schema
+            for part in ref.lstrip('#/').split('/'):
+                if part:
+                    schema = schema[part.replace('~1', '/')
+                                    .replace('~0', '~')]
+        return schema if isinstance(schema, dict) else {}
+
+    def _generate(self, schema, profile, depth):
+        schema = self._resolve(schema)
+        if 'const' in schema:
+            return schema['const']
+        if 'enum' in schema:
+            return self.random.choice(schema['enum'])
+        for key in ('anyOf', 'oneOf'):
+            if key in schema:
+                return self._generate(
+                    self.random.choice(schema[key]), profile, depth)
+        if 'allOf' in schema:
+            merged = {k: v for k, v in schema.items() if k != 'allOf'}
+            for sub_schema in schema['allOf']:
+                merged.update(self._resolve(sub_schema))
+            return self._generate(merged, profile, depth)
+        schema_type = schema.get('type')
+        if isinstance(schema_type, list):
+            schema_type = self.random.choice(schema_type)
+        if schema_type is None:
+            if 'properties' in schema:
+                schema_type = 'object'
+            elif 'items' in schema:
+                schema_type = 'array'
+            elif depth < profile['depth']:
+                schema_type = self.random.choice(['object', 'array'])
+            else:
+                schema_type = self.random.choice(
+                    ['string', 'integer', 'number', 'boolean', 'null'])
+        generate = getattr(self, '_generate_{}'.format(schema_type),
+                           self._generate_null)
+        return generate(schema, profile, depth)
+
+    def _length(self, bounds, minimum, maximum):
+        low, high = bounds
+        if maximum is not None:
+            high = min(high, maximum)
+            low = min(low, high)
+        low = max(low, minimum)
+        return self.random.randint(low, max(low, high))
+
+    def _generate_object(self, schema, profile, depth):
+        properties = schema.get('properties', {})
+        required = schema.get('required', [])
+        value = {}
+        for name, property_schema in properties.items():
+            if name in required or \
+                    (depth < MAX_DEPTH and self.random.random() < 0.5):
+                value[name] = self._generate(
+                    property_schema, profile, depth + 1)
+        additional = schema.get('additionalProperties', True)
+        if additional is not False and depth < MAX_DEPTH:
+            additional = additional if isinstance(additional, dict) else {}
+            extras = self._length(profile['extra_properties'],
+                                  schema.get('minProperties', 0) - len(value),
+                                  None)
+            if 'maxProperties' in schema:
+                extras = min(extras, schema['maxProperties'] - len(value))
+            for index in range(extras):
+                value['extra_{}'.format(index)] = self._generate(
+                    additional, profile, depth + 1)
+        return value
+
+    def _generate_array(self, schema, profile, depth):
+        items = schema.get('items', {})
+        if depth >= MAX_DEPTH:
+            length = schema.get('minItems', 0)
+        else:
+            length = self._length(profile['list_length'],
+                                  schema.get('minItems', 0),
+                                  schema.get('maxItems'))
+        if isinstance(items, list):
+            # tuple validation, one schema per position
+            return [self._generate(item, profile, depth + 1)
+                    for item in items[:length]]
+        return [self._generate(items, profile, depth + 1)
+                for _ in range(length)]
+
+    def _generate_string(self, schema, profile, depth):
+        string_format = schema.get('format')
+        if string_format == 'date-time':
+            return '2018-01-01T{:02d}:00:00Z'.format(
+                self.random.randint(0, 23))
+        if string_format == 'email':
+            return 'test{}@example.com'.format(self.random.randint(0, 999))
+        length = self._length(profile['string_length'],
+                              schema.get('minLength', 0),
+                              schema.get('maxLength'))
+        return ''.join(self.random.choices(string.ascii_letters, k=length))
+
+    def _number_bounds(self, schema, step):
+        low = schema.get('minimum', -1000)
+        high = schema.get('maximum', 1000)
+        # draft 4 uses booleans for exclusive bounds, later drafts numbers
+        exclusive = schema.get('exclusiveMinimum')
+        if exclusive is True:
+            low += step
+        elif _is_number(exclusive):
+            low = max(low, exclusive + step)
+        exclusive = schema.get('exclusiveMaximum')
+        if exclusive is True:
+            high -= step
+        elif _is_number(exclusive):
+            high = min(high, exclusive - step)
+        return low, max(low, high)
+
+    def _generate_integer(self, schema, profile, depth):
+        low, high = self._number_bounds(schema, 1)
+        return self.random.randint(int(low), int(high))
+
+    def _generate_number(self, schema, profile, depth):
+        low, high = self._number_bounds(schema, 1e-9)
+        return self.random.uniform(low, high)
+
+    def _generate_boolean(self, schema, profile, depth):
+        return self.random.random() < 0.5
+
+    def _generate_null(self, schema, profile, depth):
+        return None
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _power_of_two(number):
+    """Smallest power of two at least as big as number, 0 for 0"""
+    return 1 << (number - 1).bit_length() if number > 0 else 0
+
+
+def value_shape(value):
+    """Depth, longest list and longest string of a value, sizes rounded up
+    to a power of two so similar values share a shape"""
+    depth, longest_list, longest_string = 0, 0, 0
+    pending = [(value, 0)]
+    while pending:
+        current, level = pending.pop()
+        depth = max(depth, level)
+        if isinstance(current, dict):
+            pending.extend((item, level + 1) for item in current.values())
+        elif isinstance(current, list):
+            longest_list = max(longest_list, len(current))
+            pending.extend((item, level + 1) for item in current)
+        elif isinstance(current, str):
+            longest_string = max(longest_string, len(current))
+    return (depth, _power_of_two(longest_list), _power_of_two(longest_string))
+
+
+def batch_shape(values):
+    """The largest shape of any value in a batch, as a readable string"""
+    shapes = [value_shape(value) for value in values] or [(0, 0, 0)]
+    return 'depth={} lists<={} strings<={}'.format(
+        *(max(dimension) for dimension in zip(*shapes)))
+
+
+def shrink(values, fails, max_attempts=200):
+    """Find a smaller input that still fails
+
+    Removes values from the list, then simplifies the remaining values by
+    dropping dictionary keys and halving lists and strings.
+
+    Args:
+        values (list): a failing list of signal dictionaries
+        fails (callable): called with a candidate list, True if it fails
+        max_attempts (int): stop after calling fails this many times
+
+    Returns:
+        list: the smallest failing list found
+    """
+    attempts = [0]
+
+    def still_fails(candidate):
+        if attempts[0] >= max_attempts:
+            return False
+        attempts[0] += 1
+        return fails(candidate)
+
+    chunk = len(values) // 2
+    while chunk >= 1:
+        index = 0
+        while index < len(values):
+            candidate = values[:index] + values[index + chunk:]
+            if candidate and still_fails(candidate):
+                values = candidate
+            else:
+                index += chunk
+        chunk //= 2
+    for index in range(len(values)):
+        simplified = True
+        while simplified:
+            simplified = False
+            for simpler in _simpler_values(values[index]):
+                candidate = values[:index] + [simpler] + values[index + 1:]
+                if still_fails(candidate):
+                    values = candidate
+                    simplified = True
+                    break
+    return values
+
+
+def _simpler_values(value):
+    """Candidate values that are slightly simpler than value"""
+    if isinstance(value, dict):
+        for key in value:
+            yield {k: v for k, v in value.items() if k != key}
+        for key, item in value.items():
+            for simpler in _simpler_values(item):
+                yield dict(value, **{key: simpler})
+    elif isinstance(value, list) and value:
+        yield value[:len(value) // 2]
+        yield value[1:]
+    elif isinstance(value, str) and value:
+        yield value[:len(value) // 2]
+    elif _is_number(value) and value != 0:
+        yield 0
+
+
+class FuzzReport(object):
+    """Results of fuzzing a topic
+
+    Attributes:
+        seed: the seed that reproduces the run
+        timings (list): a ShapeTiming for every published batch
+        skipped (int): generated signals dropped for not matching the schema
+        outlier_factor (float): how much slower than the median a shape is
+            before it is an outlier, by default
+    """
+
+    def __init__(self, topic, seed, outlier_factor=10):
+        self.topic = topic
+        self.seed = seed
+        self.outlier_factor = outlier_factor
+        self.timings = []
+        self.skipped = 0
+
+    def throughput(self):
+        """Signals per second for each (profile, shape)"""
+        totals = {}
+        for timing in self.timings:
+            key = (timing.profile, timing.shape)
+            signals, seconds = totals.get(key, (0, 0))
+            totals[key] = (signals + timing.signals, seconds + timing.seconds)
+        return {key: signals / seconds if seconds else float('inf')
+                for key, (signals, seconds) in totals.items()}
+
+    def outliers(self, factor=None):
+        """(profile, shape) whose time per signal is more than factor times
+        the median time per signal over all shapes, factor defaults to the
+        report's outlier_factor"""
+        if factor is None:
+            factor = self.outlier_factor
+        throughput = self.throughput()
+        per_signal = sorted(1 / rate for rate in throughput.values() if rate)
+        if not per_signal:
+            return []
+        median = per_signal[len(per_signal) // 2]
+        return [key for key, rate in throughput.items()
+                if rate and 1 / rate > factor * median]
+
+    def __str__(self):
+        lines = ['Fuzzed topic {} with seed {}'.format(self.topic, self.seed)]
+        outliers = self.outliers()
+        for (profile, shape), rate in sorted(self.throughput().items()):
+            lines.append('  {:<12} {:<40} {:>12.1f} signals/s{}'.format(
+                profile, shape, rate,
+                '  OUTLIER' if (profile, shape) in outliers else ''))
+        return '\n'.join(lines)
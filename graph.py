@@ -0,0 +1,214 @@
+"""Static analysis of a service's execution graph
+
+The service `execution` list is compiled once into an adjacency index that
+the router uses to look up receivers, and that is checked for problems that
+would otherwise only show up while signals are being routed.
+"""
+from collections import defaultdict, deque
+
+DEFAULT_TERMINAL = "__default_terminal_value"
+
+
+class ExecutionGraph(object):
+    """The compiled execution of a service
+
+    Args:
+        execution (list): the service's execution, each entry has an `id`
+            and a `receivers` dict mapping output IDs to lists of
+            {"id": receiver_id, "input": input_id}
+        blocks (container): block IDs that exist in the service, receivers
+            that are not in it are reported as missing. Defaults to every
+            block in the execution.
+        terminals (callable): optional, called with a block ID and returns
+            (input_ids, output_ids) of that block, or None if unknown. Used
+            to report unmatched terminals.
+    """
+
+    def __init__(self, execution, blocks=None, terminals=None):
+        # block ID to the receivers dict of that block, as in the execution
+        self.receivers = {}
+        self.successors = defaultdict(list)
+        self.predecessors = defaultdict(list)
+        # (from_id, output_id, to_id, input_id) for every connection
+        self.edges = []
+        for service_block in execution:
+            block_id = service_block["id"]
+            self.receivers[block_id] = service_block.get("receivers") or {}
+            for output_id, receivers in self.receivers[block_id].items():
+                for receiver in receivers:
+                    self.edges.append((block_id, output_id,
+                                       receiver["id"], receiver["input"]))
+                    if receiver["id"] not in self.successors[block_id]:
+                        self.successors[block_id].append(receiver["id"])
+                        self.predecessors[receiver["id"]].append(block_id)
+        self.block_ids = list(self.receivers)
+        blocks = self.receivers if blocks is None else blocks
+        self.missing_receivers = [
+            (from_id, to_id) for from_id, _, to_id, _ in self.edges
+            if to_id not in blocks]
+        self.cycles = self._find_cycles()
+        self._cyclic = {block_id for cycle in self.cycles
+                        for block_id in cycle}
+        self.topological_order = self._topological_order()
+        self.dead_blocks = self._find_dead_blocks()
+        self.unmatched_terminals = self._find_unmatched_terminals(terminals)
+
+    def _find_cycles(self):
+        """Strongly connected components that contain a cycle, using an
+        iterative version of Tarjan's algorithm"""
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        cycles = []
+        counter = 0
+        for root in self.block_ids:
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                block_id, child = work.pop()
+                if child == 0:
+                    index[block_id] = lowlink[block_id] = counter
+                    counter += 1
+                    stack.append(block_id)
+                    on_stack.add(block_id)
+                successors = self.successors.get(block_id, [])
+                if child > 0:
+                    # returning from the previous successor
+                    lowlink[block_id] = min(
+                        lowlink[block_id], lowlink[successors[child - 1]])
+                while child < len(successors):
+                    successor = successors[child]
+                    if successor not in index:
+                        break
+                    if successor in on_stack:
+                        lowlink[block_id] = min(
+                            lowlink[block_id], index[successor])
+                    child += 1
+                if child < len(successors):
+                    work.append((block_id, child + 1))
+                    work.append((successors[child], 0))
+                    continue
+                if lowlink[block_id] == index[block_id]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == block_id:
+                            break
+                    if len(component) > 1 or \
+                            block_id in self.successors.get(block_id, []):
+                        cycles.append(list(reversed(component)))
+        return cycles
+
+    def _topological_order(self):
+        """Blocks ordered so every block comes before its receivers. Blocks
+        that are part of a cycle, or only reachable through one, are left
+        out."""
+        in_degree = {block_id: 0 for block_id in self.block_ids}
+        for block_id in self.block_ids:
+            for successor in self.successors.get(block_id, []):
+                if successor in in_degree:
+                    in_degree[successor] += 1
+        ready = deque(block_id for block_id in self.block_ids
+                      if in_degree[block_id] == 0)
+        order = []
+        while ready:
+            block_id = ready.popleft()
+            order.append(block_id)
+            for successor in self.successors.get(block_id, []):
+                if successor in in_degree:
+                    in_degree[successor] -= 1
+                    if in_degree[successor] == 0:
+                        ready.append(successor)
+        return order
+
+    def _find_dead_blocks(self):
+        """Blocks that can never receive or send signals to another block:
+        blocks without any connections and blocks that are only reachable
+        through a cycle nothing feeds into."""
+        sources = [block_id for block_id in self.block_ids
+                   if not self.predecessors.get(block_id)]
+        reachable = set(sources)
+        pending = list(sources)
+        while pending:
+            for successor in self.successors.get(pending.pop(), []):
+                if successor not in reachable:
+                    reachable.add(successor)
+                    pending.append(successor)
+        return [block_id for block_id in self.block_ids
+                if block_id not in reachable or
+                (not self.successors.get(block_id) and
+                 not self.predecessors.get(block_id))]
+
+    def _find_unmatched_terminals(self, terminals):
+        """Connections from an output or to an input the block doesn't
+        define, as (block_id, "output"/"input", terminal_id)"""
+        if terminals is None:
+            return []
+        unmatched = []
+        known = {}
+        for from_id, output_id, to_id, input_id in self.edges:
+            for block_id, terminal_type, terminal_id in (
+                    (from_id, 1, output_id), (to_id, 0, input_id)):
+                if block_id not in known:
+                    known[block_id] = terminals(block_id)
+                # the default terminal is always accepted by the router
+                if known[block_id] is None or terminal_id == DEFAULT_TERMINAL:
+                    continue
+                if terminal_id not in known[block_id][terminal_type]:
+                    entry = (block_id, ("input", "output")[terminal_type],
+                             terminal_id)
+                    if entry not in unmatched:
+                        unmatched.append(entry)
+        return unmatched
+
+    def in_cycle(self, block_id):
+        """Whether a block is part of a cycle in the execution"""
+        return block_id in self._cyclic
+
+    @property
+    def fan_out(self):
+        """Number of receivers, over all outputs, of every block"""
+        return {block_id: sum(len(receivers) for receivers in
+                              self.receivers[block_id].values())
+                for block_id in self.block_ids}
+
+    @property
+    def depth(self):
+        """Length of the longest path from a block that receives no signals
+        to each block, for blocks that are not part of a cycle"""
+        depth = {}
+        for block_id in self.topological_order:
+            depth[block_id] = max(
+                [depth[predecessor] + 1 for predecessor in
+                 self.predecessors.get(block_id, []) if predecessor in depth]
+                or [0])
+        return depth
+
+    @property
+    def max_depth(self):
+        return max(self.depth.values() or [0])
+
+    def problems(self):
+        """Describe everything found wrong with the execution
+
+        Returns:
+            list: a message per problem, empty if the execution is fine
+        """
+        problems = []
+        for from_id, to_id in self.missing_receivers:
+            problems.append('Block {} sends signals to {}, which is not a '
+                            'block in the service'.format(from_id, to_id))
+        for cycle in self.cycles:
+            problems.append('Blocks form a cycle: {}'.format(
+                ' -> '.join(cycle + [cycle[0]])))
+        for block_id in self.dead_blocks:
+            problems.append('Block {} can never receive or send signals'
+                            .format(block_id))
+        for block_id, terminal_type, terminal_id in self.unmatched_terminals:
+            problems.append('Block {} has no {} terminal {}'.format(
+                block_id, terminal_type, terminal_id))
+        return problems
@@ -0,0 +1,181 @@
+"""End to end latency of signals through a service
+
+Signals injected by a test are stamped with where and when they entered the
+service. When the service publishes a signal carrying a stamp, the time it
+took is recorded in a histogram for that (input, output topic) pair.
+Histograms use HDR style buckets: exact for small values and with a fixed
+relative error above that, so recording is a couple of integer operations
+and memory only grows with the range of latencies seen.
+"""
+from collections import Counter
+import json
+from threading import local
+from time import monotonic
+
+# Hidden signal attribute holding (input, ingress time), hidden attributes
+# are left out of Signal.to_dict so assertions on signals are unaffected
+INGRESS_ATTRIBUTE = '_service_test_ingress'
+
+
+class LatencyHistogram(object):
+    """A histogram of latencies with a bounded relative error
+
+    Args:
+        significant_figures (int): decimal digits of precision kept for every
+            value, 2 keeps values within 1%
+        unit (float): smallest latency that is told apart, in seconds
+    """
+
+    def __init__(self, significant_figures=2, unit=1e-6):
+        self.significant_figures = significant_figures
+        self.unit = unit
+        self._bits = (2 * 10 ** significant_figures - 1).bit_length()
+        self.counts = Counter()
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0
+
+    def _index(self, value):
+        magnitude = max(value.bit_length() - self._bits, 0)
+        return (magnitude << self._bits) + (value >> magnitude)
+
+    def _bucket_value(self, index):
+        """The middle of the values that fall in a bucket, in units"""
+        magnitude = index >> self._bits
+        sub_bucket = index & ((1 << self._bits) - 1)
+        return (sub_bucket << magnitude) + ((1 << magnitude) - 1) / 2
+
+    def record(self, seconds):
+        self.counts[self._index(max(int(seconds / self.unit), 0))] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        """Add the values recorded by another histogram with the same
+        precision"""
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percentile):
+        """The latency in seconds that percentile percent of the recorded
+        latencies are at or below, None if nothing was recorded"""
+        if not self.count:
+            return None
+        if percentile >= 100:
+            return self.max
+        target = max(percentile / 100 * self.count, 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                value = self._bucket_value(index) * self.unit
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'percentiles': {str(percentile): self.percentile(percentile)
+                            for percentile in (50, 90, 99, 99.9, 100)},
+            # bucket value in seconds and how many latencies fell in it
+            'buckets': [[self._bucket_value(index) * self.unit,
+                         self.counts[index]]
+                        for index in sorted(self.counts)],
+        }
+
+    def __str__(self):
+        if not self.count:
+            return 'no latencies recorded'
+        return 'count={} p50={:.6f}s p99={:.6f}s max={:.6f}s'.format(
+            self.count, self.percentile(50), self.percentile(99), self.max)
+
+
+class LatencyRecorder(object):
+    """Stamps injected signals and records their latency when published
+
+    Attributes:
+        histograms (dict): (input, output topic) to LatencyHistogram, the
+            input is a topic or the ID of the block signals were notified
+            from
+        uncorrelated (Counter): output topic to the number of published
+            signals that couldn't be traced back to an injected signal
+    """
+
+    def __init__(self, significant_figures=2):
+        self.significant_figures = significant_figures
+        self.histograms = {}
+        self.uncorrelated = Counter()
+        self._current = local()
+
+    def stamp(self, signals, source):
+        """Mark signals as entering the service now from source. Until
+        end_ingress is called, signals published on this thread without a
+        stamp, e.g. new signals created by a block, count from this
+        ingress."""
+        ingress = (source, monotonic())
+        for signal in signals:
+            setattr(signal, INGRESS_ATTRIBUTE, ingress)
+        self._current.ingress = ingress
+
+    def end_ingress(self):
+        self._current.ingress = None
+
+    def record(self, signals, topic):
+        """Record the latency of signals published on topic"""
+        now = monotonic()
+        current = getattr(self._current, 'ingress', None)
+        for signal in signals:
+            ingress = getattr(signal, INGRESS_ATTRIBUTE, current)
+            if ingress is None:
+                self.uncorrelated[topic] += 1
+                continue
+            source, started = ingress
+            histogram = self.histograms.get((source, topic))
+            if histogram is None:
+                histogram = self.histograms[(source, topic)] = \
+                    LatencyHistogram(self.significant_figures)
+            histogram.record(now - started)
+
+    def histogram(self, source=None, topic=None):
+        """A histogram of every latency from source to topic, None matches
+        any source or topic"""
+        merged = LatencyHistogram(self.significant_figures)
+        for (pair_source, pair_topic), histogram in self.histograms.items():
+            if source in (None, pair_source) and topic in (None, pair_topic):
+                merged.merge(histogram)
+        return merged
+
+    def clear(self):
+        self.histograms.clear()
+        self.uncorrelated.clear()
+
+    def to_dict(self):
+        return {
+            'pairs': [dict(histogram.to_dict(), input=source, output=topic)
+                      for (source, topic), histogram in
+                      sorted(self.histograms.items(),
+                             key=lambda item: str(item[0]))],
+            'uncorrelated': dict(self.uncorrelated),
+        }
+
+    def export(self, file_path):
+        """Write the histograms as JSON to a file"""
+        with open(file_path, 'w') as latency_file:
+            json.dump(self.to_dict(), latency_file, indent=2)
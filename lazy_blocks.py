@@ -0,0 +1,57 @@
+from threading import RLock
+
+
+class LazyBlocks(dict):
+    """A mapping of service block IDs to blocks that creates blocks on demand
+
+    Blocks are registered with `defer` along with their config and are only
+    instantiated and configured, through the given factory, the first time
+    they are looked up (e.g. when the router notifies signals to them or a
+    test calls `get_block`). Membership checks include blocks that have not
+    been created yet, iteration only covers blocks that have been created.
+    Blocks are created under a lock, threads looking a block up while it is
+    created wait for it.
+    """
+
+    def __init__(self, factory):
+        """Create the mapping
+
+        Args:
+            factory (callable): called as factory(block_id, block_config)
+                and expected to return a configured block instance
+        """
+        super().__init__()
+        self._factory = factory
+        self._pending = {}
+        # reentrant, creating a block can look up other lazy blocks
+        self._create_lock = RLock()
+
+    def defer(self, block_id, block_config):
+        """Register a block to be created the first time it is accessed"""
+        self._pending[block_id] = block_config
+
+    @property
+    def pending(self):
+        """IDs of the blocks that have not been created yet"""
+        return list(self._pending)
+
+    def __missing__(self, block_id):
+        with self._create_lock:
+            # another thread may have created it while we waited
+            if super().__contains__(block_id):
+                return super().__getitem__(block_id)
+            if block_id not in self._pending:
+                raise KeyError(block_id)
+            # stays pending until it is created, so it is always in self
+            block = self._factory(block_id, self._pending[block_id])
+            self[block_id] = block
+            del self._pending[block_id]
+            return block
+
+    def __contains__(self, block_id):
+        return super().__contains__(block_id) or block_id in self._pending
+
+    def get(self, block_id, default=None):
+        if block_id in self:
+            return self[block_id]
+        return default
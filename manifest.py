@@ -0,0 +1,124 @@
+"""Block discovery manifest
+
+Discovering block classes imports every module in the project's blocks
+package. A manifest maps block type names to the modules that define them,
+so a test only imports the blocks its service uses. It is built by reading
+the block sources, without importing them:
+
+    python service_tests/manifest.py [project directory]
+
+Blocks missing from the manifest are still found by discovery, so an out of
+date manifest only makes startup slower.
+"""
+import argparse
+import ast
+from functools import lru_cache
+from importlib import import_module
+import json
+import os
+
+MANIFEST_FILE = 'block_manifest.json'
+
+
+def build_manifest(project_dir, blocks_package='blocks'):
+    """Map the name of every class in the blocks package to the modules
+    defining a class with that name. Test directories are skipped.
+
+    Returns:
+        dict: the manifest, as written to MANIFEST_FILE
+    """
+    blocks = {}
+    package_dir = os.path.join(project_dir, blocks_package)
+    for directory, sub_directories, files in os.walk(package_dir):
+        sub_directories[:] = sorted(
+            name for name in sub_directories
+            if name not in ('tests', '__pycache__') and
+            not name.startswith('.'))
+        for file_name in sorted(files):
+            if not file_name.endswith('.py'):
+                continue
+            path = os.path.join(directory, file_name)
+            module = os.path.relpath(path[:-3], project_dir) \
+                .replace(os.sep, '.')
+            if file_name == '__init__.py':
+                module = module[:-len('.__init__')]
+            for class_name in _class_names(path):
+                blocks.setdefault(class_name, []).append(module)
+    return {'blocks_package': blocks_package, 'blocks': blocks}
+
+
+def _class_names(path):
+    """Names of the top level classes with a base class in a module"""
+    try:
+        with open(path, 'rb') as source_file:
+            tree = ast.parse(source_file.read(), path)
+    except (SyntaxError, ValueError):
+        # discovery reports modules that don't parse
+        return []
+    return [node.name for node in tree.body
+            if isinstance(node, ast.ClassDef) and node.bases]
+
+
+def write_manifest(project_dir, path=None, blocks_package='blocks'):
+    path = path or os.path.join(project_dir, MANIFEST_FILE)
+    with open(path, 'w') as manifest_file:
+        json.dump(build_manifest(project_dir, blocks_package), manifest_file,
+                  indent=2, sort_keys=True)
+    return path
+
+
+def load_manifest(path):
+    """The manifest at path, None if there isn't one"""
+    if not os.path.isfile(path):
+        return None
+    return _load_manifest(path, os.path.getmtime(path))
+
+
+@lru_cache()
+def _load_manifest(path, modified):
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def import_block_class(manifest, block_type, base, is_discoverable):
+    """Import the block class of a type using the manifest
+
+    Args:
+        manifest (dict): a loaded manifest
+        block_type (str): the class name of the block
+        base (type): block classes are subclasses of it
+        is_discoverable (callable): called with a class, False for classes
+            discovery would skip
+
+    Returns:
+        type: the block class, None if the manifest doesn't know it
+    """
+    for module_name in manifest['blocks'].get(block_type, []):
+        try:
+            module = import_module(module_name)
+        except Exception:
+            # leave broken modules to discovery, which reports them
+            continue
+        block_class = getattr(module, block_type, None)
+        if isinstance(block_class, type) and \
+                issubclass(block_class, base) and \
+                is_discoverable(block_class):
+            return block_class
+    return None
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Write a manifest of the block classes in a project')
+    parser.add_argument('project_dir', nargs='?', default='.',
+                        help='the nio project, defaults to this directory')
+    parser.add_argument('--output', help='defaults to {} in the project'
+                                         .format(MANIFEST_FILE))
+    parser.add_argument('--blocks-package', default='blocks')
+    args = parser.parse_args(args)
+    path = write_manifest(args.project_dir, args.output, args.blocks_package)
+    print('Wrote {}'.format(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,25 @@
-from .scheduler import SyncScheduler
+from .scheduler import current_scheduler
 
 
 class Job(object):
 
     def __init__(self, target, delta, repeatable, *args, **kwargs):
-        self._job = SyncScheduler.schedule_task(
+        # bind to the scheduler in use when the job is created, so the job
+        # can be cancelled from any thread
+        self._scheduler = current_scheduler()
+        self._job = self._scheduler.schedule_task(
             target, delta, repeatable, *args, **kwargs)
 
     def cancel(self):
-        SyncScheduler.unschedule(self._job)
+        self._scheduler.unschedule(self._job)
 
     def jump_ahead(self, seconds):
         """ Jump the scheudler forward a certain number of seconds.
 
         This is useful in tests to simulate time passing for event-driven
         logic and temporal assertions.
+
+        Returns:
+            list: an Execution for every job that fired
         """
-        SyncScheduler.jump_ahead(seconds)
+        return self._scheduler.jump_ahead(seconds)
@@ -2,21 +2,39 @@ from nio.modules.context import ModuleContext
 from .job import Job
 from nio.modules.scheduler.module import SchedulerModule
 
-from .scheduler import SyncScheduler
+from .scheduler import SynchronousSchedulerRunner, current_scheduler, \
+    inherit_schedulers, use_scheduler
 
 
 class SynchronousSchedulerModule(SchedulerModule):
 
+    def __init__(self, background=True):
+        """ Every module instance has its own scheduler, so each test gets a
+        fresh one and tests on different threads don't share jobs.
+
+        Args:
+            background (bool): also fire jobs in real time from a thread,
+                see SynchronousSchedulerRunner
+        """
+        super().__init__()
+        self.scheduler = SynchronousSchedulerRunner(background)
+
     def initialize(self, context):
         super().initialize(context)
         # For testing, use a job class that allows us to jump ahead in time
         self.proxy_job_class(Job)
 
-        SyncScheduler.do_configure(context)
-        SyncScheduler.do_start()
+        inherit_schedulers(True)
+        use_scheduler(self.scheduler)
+        self.scheduler.do_configure(context)
+        self.scheduler.do_start()
 
     def finalize(self):
-        SyncScheduler.do_stop()
+        in_use = current_scheduler() is self.scheduler
+        self.scheduler.do_stop()
+        if in_use:
+            use_scheduler(None)
+        inherit_schedulers(False)
         super().finalize()
 
     def prepare_core_context(self):
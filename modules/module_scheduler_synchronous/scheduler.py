@@ -1,22 +1,47 @@
 import heapq
-from collections import namedtuple
+from collections import Counter, defaultdict, namedtuple
 from datetime import timedelta
-from threading import Event, RLock
+from importlib import import_module
+from threading import Event, Lock, RLock, local
 from time import monotonic
 from uuid import uuid4
 
+from nio.modules.context import ModuleContext
 from nio.modules.module import ModuleNotInitialized
 from nio.util.logging import get_nio_logger
 from nio.util.runner import RunnerStatus, Runner
 from nio.util.threading import spawn
+from nio.util.threading.thread import NIOThread
 
 QueueEvent = namedtuple('Event', 'time, id, target, frequency, args, kwargs')
+# A scheduled job as reported by pending_jobs, delay is the number of seconds
+# until the job fires next
+PendingJob = namedtuple('PendingJob', 'id, time, delay, target, repeatable')
+# A job that fired, duration is how long its target took
+Execution = namedtuple('Execution', 'id, time, target, duration')
+
+# The scheduler each thread schedules jobs with, see use_scheduler
+_thread_schedulers = local()
+# nio's spawn creates the threads blocks start from this module's NIOThread
+_spawn_module = import_module('nio.util.threading.spawn')
+# How many scheduler modules want spawned threads to inherit schedulers
+_inheriting = 0
+_inheriting_lock = Lock()
+_sync_scheduler_lock = Lock()
 
 
 class SynchronousSchedulerRunner(Runner):
 
-    def __init__(self):
+    def __init__(self, background=True):
+        """ Create a scheduler
+
+        Args:
+            background (bool): also fire jobs in real time from a thread.
+                Without it jobs only fire when jumping ahead, and the
+                scheduler never starts or joins a thread.
+        """
         super().__init__()
+        self._background = background
         self._sched_min_delta = 0.1
         self._sched_resolution = 0.1
         self.logger = get_nio_logger("Custom Scheduler")
@@ -30,6 +55,9 @@ class SynchronousSchedulerRunner(Runner):
         # event used to wait for next task to execute and/or wait at scheduler
         # resolution
         self._sleep_interrupt_event = Event()
+        # how many times each target fired and the total time it took
+        self.fire_counts = Counter()
+        self.callback_times = defaultdict(float)
 
     def configure(self, context):
         # Load in the minimum delta and resolution from the config
@@ -49,9 +77,9 @@ class SynchronousSchedulerRunner(Runner):
         self._stop_event.set()
         self._stop_event.clear()
         self._events.clear()
-        if self._process_events_thread is not None:
-            self._process_events_thread.join(self._sched_resolution)
         self.offset = 0
+        self.fire_counts.clear()
+        self.callback_times.clear()
 
     def schedule_task(self, target, delta, repeatable, *args, **kwargs):
         """ Add the given task to the Scheduler.
@@ -140,14 +168,18 @@ class SynchronousSchedulerRunner(Runner):
 
     def stop(self):
         self._stop_event.set()
+        if self._process_events_thread is None:
+            return
         # do not join indefinitely, allow a reasonable time
         self._process_events_thread.join(10 * self._sched_resolution)
         if self._process_events_thread.is_alive():
             self.logger.warning("Scheduler thread did not end properly, "
                                 "it timed out")
+        self._process_events_thread = None
 
     def start(self):
-        self._process_events_thread = spawn(self._process_events)
+        if self._background:
+            self._process_events_thread = spawn(self._process_events)
 
     def _process_events(self):
         """ Process scheduled events
@@ -157,7 +189,8 @@ class SynchronousSchedulerRunner(Runner):
             for next pending tasks execution
         Any exception that may arise is logged while loop continues execution
         """
-
+        # jobs scheduled by targets running on this thread belong to us
+        _thread_schedulers.scheduler = self
         while not self._stop_event.is_set():
             try:
                 next_try_time = self._execute_pending_tasks()
@@ -166,7 +199,7 @@ class SynchronousSchedulerRunner(Runner):
                 # log any exception, do not leave loop
                 self.logger.exception('Exception caught')
 
-    def _execute_pending_tasks(self):
+    def _execute_pending_tasks(self, executions=None):
         """ Executes pending tasks
 
         This method will execute pending tasks, as soon as no task is ready for
@@ -179,6 +212,10 @@ class SynchronousSchedulerRunner(Runner):
             time is calculated as the minimum between scheduler's resolution
             and next event scheduled time.
 
+        Args:
+            executions (list): optional, an Execution is appended to it for
+                every task that is executed
+
         Returns:
             recommended time to wait before events are next considered
         """
@@ -203,6 +240,7 @@ class SynchronousSchedulerRunner(Runner):
                 return min(event_time - now, self._sched_resolution)
             else:
                 # time is up, execute
+                started = monotonic()
                 try:
                     self.logger.debug("Executing: {0}".format(target))
                     # launch target task from a different thread thus
@@ -210,6 +248,12 @@ class SynchronousSchedulerRunner(Runner):
                     target(*args, **kwargs)
                 except Exception:
                     self.logger.exception('Calling: {0}'.format(target))
+                duration = monotonic() - started
+                self.fire_counts[target] += 1
+                self.callback_times[target] += duration
+                if executions is not None:
+                    executions.append(
+                        Execution(event_id, event_time, target, duration))
 
                 with self._events_lock:
                     # before processing any further, make sure event has
@@ -251,6 +295,9 @@ class SynchronousSchedulerRunner(Runner):
         Args:
             seconds (float): How many seconds to simulate passing in time.
 
+        Returns:
+            list: an Execution for every job that fired, in order
+
         Raises:
             ValueError: If seconds is negative - can't go back in time
         """
@@ -260,7 +307,89 @@ class SynchronousSchedulerRunner(Runner):
         self.offset += seconds
 
         # have scheduler execute tasks that might be ready after this jump
-        self._execute_pending_tasks()
+        executions = []
+        self._execute_pending_tasks(executions)
+        return executions
+
+    def pending_jobs(self):
+        """ The jobs waiting to fire, soonest first
+
+        Returns:
+            list: a PendingJob for every scheduled job
+        """
+        now = self._get_time()
+        with self._queue_lock:
+            events = sorted(self._queue)
+        return [PendingJob(event.id, event.time, max(event.time - now, 0),
+                           event.target, bool(event.frequency))
+                for event in events]
+
+    def current_time(self):
+        """ The scheduler's clock, including any time jumped ahead """
+        return self._get_time()
+
+    def scheduled_events(self):
+        """ A copy of every scheduled event, soonest first """
+        with self._queue_lock:
+            return sorted(self._queue)
+
+    def replace_events(self, events):
+        """ Replace every scheduled event with the given events
+
+        Used to restore the scheduler to an earlier state. Event times are
+        compared against the scheduler's time, including its offset.
+
+        Args:
+            events (list): QueueEvents to schedule instead
+        """
+        with self._events_lock, self._queue_lock:
+            self._queue[:] = list(events)
+            heapq.heapify(self._queue)
+            self._events.clear()
+            self._events.update((event.id, event) for event in events)
+
+    def next_event_time(self):
+        """ Seconds until the next job fires, None if nothing is scheduled
+
+        Jumping ahead by this many seconds fires the next job, and any other
+        jobs due at the same time.
+        """
+        with self._queue_lock:
+            if not self._queue:
+                return None
+            event_time = self._queue[0].time
+        return max(event_time - self._get_time(), 0)
+
+    def run_until_idle(self, max_seconds=None):
+        """ Jump from one job to the next until no jobs are left
+
+        Repeatable jobs never finish, so without max_seconds this stops as
+        soon as only repeatable jobs are scheduled.
+
+        Args:
+            max_seconds (float): optional, don't jump further ahead than
+                this many seconds in total. Repeatable jobs keep firing
+                until then.
+
+        Returns:
+            list: an Execution for every job that fired, in order
+        """
+        executions = []
+        jumped = 0
+        while True:
+            delay = self.next_event_time()
+            if delay is None:
+                break
+            if max_seconds is None:
+                if all(job.repeatable for job in self.pending_jobs()):
+                    break
+            elif jumped + delay > max_seconds:
+                break
+            executions.extend(self.jump_ahead(delay))
+            jumped += delay
+        if max_seconds is not None and jumped < max_seconds:
+            executions.extend(self.jump_ahead(max_seconds - jumped))
+        return executions
 
     def _get_time(self):
         """ Time retrieval method to use when comparing against event time
@@ -269,5 +398,72 @@ class SynchronousSchedulerRunner(Runner):
         # This clock is not affected by system clock updates
         return monotonic() + self.offset
 
-# Singleton reference to a scheduler
+# Singleton reference to a scheduler, used by threads without a scheduler
 SyncScheduler = SynchronousSchedulerRunner()
+
+
+class SchedulerThread(NIOThread):
+    """ A thread spawned with nio's spawn while schedulers are inherited, it
+    schedules jobs with the scheduler of the thread that spawned it """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._scheduler = getattr(_thread_schedulers, 'scheduler', None)
+
+    def run(self):
+        _thread_schedulers.scheduler = self._scheduler
+        super().run()
+
+
+def inherit_schedulers(enabled):
+    """ Have threads spawned with nio's spawn, which is how blocks start
+    threads, use the scheduler of the thread that spawned them
+
+    Calls enabling it are counted and must each be matched by a call
+    disabling it, spawn is back to normal once none are left. Threads
+    started in any other way are never affected.
+
+    Args:
+        enabled (bool): True while a scheduler module is initialized
+    """
+    global _inheriting
+    with _inheriting_lock:
+        _inheriting += 1 if enabled else -1
+        _spawn_module.NIOThread = \
+            SchedulerThread if _inheriting > 0 else NIOThread
+
+
+def use_scheduler(scheduler):
+    """ Schedule jobs created on this thread with the given scheduler
+
+    While schedulers are inherited, see inherit_schedulers, threads spawned
+    from this thread afterwards use the same scheduler. Other threads are
+    not affected, so tests on different threads each keep their own
+    scheduler.
+
+    Args:
+        scheduler (SynchronousSchedulerRunner): the scheduler to use, None
+            to go back to the SyncScheduler singleton
+    """
+    _thread_schedulers.scheduler = scheduler
+
+
+def current_scheduler():
+    """ The scheduler jobs created on this thread are scheduled with
+
+    Threads without a scheduler, or whose scheduler was stopped because the
+    test that spawned them finished, use the SyncScheduler singleton. It is
+    started the first time it is needed.
+    """
+    scheduler = getattr(_thread_schedulers, 'scheduler', None)
+    if scheduler is not None and \
+            scheduler.status.is_set(RunnerStatus.started):
+        return scheduler
+    with _sync_scheduler_lock:
+        if not SyncScheduler.status.is_set(RunnerStatus.started):
+            context = ModuleContext()
+            context.min_interval = 0.01
+            context.resolution = 0.01
+            SyncScheduler.do_configure(context)
+            SyncScheduler.do_start()
+    return SyncScheduler
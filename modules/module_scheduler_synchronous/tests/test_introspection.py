@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from nio.testing.test_case import NIOTestCase
+
+from ..job import Job
+from ..module import SynchronousSchedulerModule
+from ..scheduler import current_scheduler
+
+
+class TestSchedulerIntrospection(NIOTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.times_called = 0
+        self.scheduler = current_scheduler()
+
+    def _callback(self):
+        self.times_called += 1
+
+    def _other_callback(self):
+        pass
+
+    def get_test_modules(self):
+        return {'scheduler'}
+
+    def get_module(self, module_name):
+        if module_name == 'scheduler':
+            return SynchronousSchedulerModule()
+
+    def test_pending_jobs(self):
+        """ Pending jobs are listed soonest first """
+        Job(self._callback, timedelta(seconds=20), True)
+        Job(self._other_callback, timedelta(seconds=10), False)
+        pending = self.scheduler.pending_jobs()
+        self.assertEqual(len(pending), 2)
+        self.assertEqual(pending[0].target, self._other_callback)
+        self.assertFalse(pending[0].repeatable)
+        self.assertAlmostEqual(pending[0].delay, 10, places=1)
+        self.assertEqual(pending[1].target, self._callback)
+        self.assertTrue(pending[1].repeatable)
+
+    def test_jump_ahead_returns_executions(self):
+        """ jump_ahead returns the jobs that fired and counts them """
+        job = Job(self._callback, timedelta(seconds=5), True)
+        self.assertEqual(job.jump_ahead(2), [])
+        executions = job.jump_ahead(14)
+        self.assertEqual(len(executions), 3)
+        self.assertTrue(all(execution.target == self._callback
+                            for execution in executions))
+        self.assertEqual(self.scheduler.fire_counts[self._callback], 3)
+        self.assertGreaterEqual(
+            self.scheduler.callback_times[self._callback], 0)
+
+    def test_next_event_time(self):
+        """ Jumping by next_event_time fires exactly the next job """
+        self.assertIsNone(self.scheduler.next_event_time())
+        Job(self._callback, timedelta(seconds=30), False)
+        Job(self._other_callback, timedelta(seconds=60), False)
+        executions = self.scheduler.jump_ahead(
+            self.scheduler.next_event_time())
+        self.assertEqual([e.target for e in executions], [self._callback])
+        self.assertEqual(self.times_called, 1)
+        self.assertAlmostEqual(self.scheduler.next_event_time(), 30, places=1)
+
+    def test_run_until_idle(self):
+        """ run_until_idle fires one-off jobs and stops at repeatable ones """
+        Job(self._callback, timedelta(seconds=30), False)
+        Job(self._callback, timedelta(seconds=90), False)
+        Job(self._other_callback, timedelta(seconds=7), True)
+        executions = self.scheduler.run_until_idle()
+        self.assertEqual(self.times_called, 2)
+        # the repeatable job fired every 7 seconds until the last one-off job
+        self.assertEqual(self.scheduler.fire_counts[self._other_callback], 12)
+        self.assertEqual(len(executions), 14)
+        self.assertEqual(len(self.scheduler.pending_jobs()), 1)
+
+    def test_run_until_idle_max_seconds(self):
+        """ run_until_idle does not jump past max_seconds """
+        Job(self._callback, timedelta(seconds=5), True)
+        executions = self.scheduler.run_until_idle(max_seconds=22)
+        self.assertEqual(len(executions), 4)
+        self.assertAlmostEqual(self.scheduler.next_event_time(), 3, places=1)
+
+    def test_replace_events(self):
+        """ Scheduled events can be exported and put back later """
+        Job(self._callback, timedelta(seconds=10), False)
+        events = self.scheduler.scheduled_events()
+        self.scheduler.replace_events([])
+        self.assertIsNone(self.scheduler.next_event_time())
+        self.scheduler.jump_ahead(20)
+        self.assertEqual(self.times_called, 0)
+        self.scheduler.replace_events(
+            [event._replace(time=self.scheduler.current_time() + 5)
+             for event in events])
+        self.assertEqual(len(self.scheduler.jump_ahead(5)), 1)
+        self.assertEqual(self.times_called, 1)
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from threading import Event, Thread
+
+from nio.testing.test_case import NIOTestCase
+from nio.util.threading import spawn
+
+from ..job import Job
+from ..module import SynchronousSchedulerModule
+from ..scheduler import SyncScheduler, current_scheduler, use_scheduler
+
+
+class TestSchedulerIsolation(NIOTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.times_called = 0
+
+    def _callback(self):
+        self.times_called += 1
+
+    def get_test_modules(self):
+        return {'scheduler'}
+
+    def get_module(self, module_name):
+        if module_name == 'scheduler':
+            self.module = SynchronousSchedulerModule(background=False)
+            return self.module
+
+    def test_module_scheduler_in_use(self):
+        """ Jobs are scheduled with the module's own scheduler """
+        self.assertIs(current_scheduler(), self.module.scheduler)
+        self.assertIsNot(current_scheduler(), SyncScheduler)
+        job = Job(self._callback, timedelta(seconds=5), False)
+        self.assertEqual(len(self.module.scheduler.pending_jobs()), 1)
+        self.assertEqual(SyncScheduler.pending_jobs(), [])
+        job.jump_ahead(5)
+        self.assertEqual(self.times_called, 1)
+
+    def test_no_thread_without_background(self):
+        """ A scheduler without background never starts a thread """
+        self.assertIsNone(self.module.scheduler._process_events_thread)
+        # and doesn't fire jobs in real time
+        Job(self._callback, timedelta(seconds=0.01), True)
+        self.module.scheduler._stop_event.wait(0.05)
+        self.assertEqual(self.times_called, 0)
+
+    def test_threads_use_their_own_scheduler(self):
+        """ Schedulers picked on other threads don't see each other's jobs """
+        other = SynchronousSchedulerModule(background=False).scheduler
+        other.do_configure(self.module.prepare_core_context())
+        other.do_start()
+        pending = []
+
+        def schedule_on_other():
+            use_scheduler(other)
+            Job(self._callback, timedelta(seconds=5), False)
+            pending.append(len(current_scheduler().pending_jobs()))
+
+        thread = Thread(target=schedule_on_other)
+        thread.start()
+        thread.join()
+        self.assertIs(current_scheduler(), self.module.scheduler)
+        self.assertEqual(pending, [1])
+        self.assertEqual(self.module.scheduler.pending_jobs(), [])
+        other.jump_ahead(5)
+        self.assertEqual(self.times_called, 1)
+        other.do_stop()
+
+    def test_spawned_threads_inherit_scheduler(self):
+        """ Spawned threads keep the scheduler of the thread that spawned
+        them, even when another thread's scheduler is finalized """
+        other = SynchronousSchedulerModule(background=False)
+        other.scheduler.do_configure(other.prepare_core_context())
+        other.scheduler.do_start()
+        schedulers = []
+
+        def spawned():
+            schedulers.append(current_scheduler())
+            Job(self._callback, timedelta(seconds=5), False)
+
+        def other_test():
+            use_scheduler(other.scheduler)
+            spawn(spawned).join()
+            # what finalizing the other test's module does
+            other.scheduler.do_stop()
+            use_scheduler(None)
+
+        spawn(other_test).join()
+        spawn(spawned).join()
+        self.assertEqual(schedulers, [other.scheduler, self.module.scheduler])
+        self.assertEqual(len(self.module.scheduler.pending_jobs()), 1)
+        self.assertEqual(SyncScheduler.pending_jobs(), [])
+
+    def test_stopped_scheduler_falls_back(self):
+        """ A spawned thread that outlives its test's scheduler, and threads
+        not started with spawn, schedule jobs with the SyncScheduler """
+        other = SynchronousSchedulerModule(background=False)
+        other.scheduler.do_configure(other.prepare_core_context())
+        other.scheduler.do_start()
+        stopped = Event()
+        schedulers = []
+
+        def worker():
+            schedulers.append(current_scheduler())
+            stopped.wait(1)
+            schedulers.append(current_scheduler())
+            job = Job(self._callback, timedelta(seconds=5), False)
+            job.cancel()
+
+        use_scheduler(other.scheduler)
+        thread = spawn(worker)
+        plain = Thread(target=worker)
+        plain.start()
+        use_scheduler(self.module.scheduler)
+        other.scheduler.do_stop()
+        stopped.set()
+        thread.join()
+        plain.join()
+        self.assertEqual(sorted(map(id, schedulers)), sorted(map(id, [
+            other.scheduler, SyncScheduler, SyncScheduler, SyncScheduler])))
+        self.assertEqual(SyncScheduler.pending_jobs(), [])
@@ -0,0 +1,125 @@
+"""Processed signals by block input
+
+The router keeps a single list of the signals each block processed. The
+input each signal came in on is stored as runs of (input_id, start, end)
+over that list, one per process_signals call at most, so looking signals up
+by input doesn't keep a second copy of every list.
+"""
+from collections.abc import Mapping, Sequence
+
+
+def tag_input(tags, input_id, start, end):
+    """Record that a block's signals from start to end came in on input_id,
+    extending the last run when it is the same input"""
+    # drop runs past start, the test cleared or truncated the block's list
+    while tags and tags[-1][1] >= start:
+        tags.pop()
+    if tags and tags[-1][2] > start:
+        tags[-1][2] = start
+    if start == end:
+        return
+    if tags and tags[-1][0] == input_id and tags[-1][2] == start:
+        tags[-1][2] = end
+    else:
+        tags.append([input_id, start, end])
+
+
+class InputSignals(Sequence):
+    """The signals a block processed on one input. The view is live, it
+    always reads the block's processed signals as they are now."""
+
+    def __init__(self, signals, tags, block_name, input_id):
+        self._signals = signals
+        self._tags = tags
+        self._block_name = block_name
+        self._input_id = input_id
+
+    def _runs(self):
+        length = len(self._signals.get(self._block_name, ()))
+        return [(start, min(end, length)) for input_id, start, end in
+                list(self._tags.get(self._block_name, ()))
+                if input_id == self._input_id and start < length]
+
+    def __len__(self):
+        return sum(end - start for start, end in self._runs())
+
+    def __iter__(self):
+        signals = self._signals.get(self._block_name, [])
+        for start, end in self._runs():
+            for index in range(start, end):
+                yield signals[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for start, end in self._runs():
+                if index < end - start:
+                    return self._signals[self._block_name][start + index]
+                index -= end - start
+        raise IndexError('input signal index out of range')
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, InputSignals)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class BlockInputs(Mapping):
+    """Input ID to the signals a block processed on that input. Like a
+    defaultdict, inputs without signals give an empty view, but they are
+    not added."""
+
+    def __init__(self, signals, tags, block_name):
+        self._signals = signals
+        self._tags = tags
+        self._block_name = block_name
+
+    def __getitem__(self, input_id):
+        return InputSignals(
+            self._signals, self._tags, self._block_name, input_id)
+
+    def __contains__(self, input_id):
+        return any(tag[0] == input_id for tag in
+                   list(self._tags.get(self._block_name, ())))
+
+    def __iter__(self):
+        seen = []
+        for tag in list(self._tags.get(self._block_name, ())):
+            if tag[0] not in seen:
+                seen.append(tag[0])
+                yield tag[0]
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+
+class ProcessedInputs(Mapping):
+    """Block name to the block's processed signals by input
+
+    Args:
+        signals (defaultdict): block name to processed signals
+        tags (defaultdict): block name to the input runs of its signals
+    """
+
+    def __init__(self, signals, tags):
+        self._signals = signals
+        self._tags = tags
+
+    def __getitem__(self, block_name):
+        return BlockInputs(self._signals, self._tags, block_name)
+
+    def __contains__(self, block_name):
+        return bool(self._tags.get(block_name))
+
+    def __iter__(self):
+        return (block_name for block_name, tags in list(self._tags.items())
+                if tags)
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,142 @@
+"""Columnar queries over captured signals
+
+A `SignalView` converts the signals it is given to columns once, the first
+time a query needs them, and then filters, projects, groups and aggregates
+on those columns instead of calling `to_dict()` on every signal per query.
+"""
+from collections import Counter
+
+from .fixtures import MISSING, SignalBatch
+
+
+class SignalView(object):
+    """A lazily built columnar view over a list of signals
+
+    Args:
+        signals (list): the signals to query, the list is copied so signals
+            captured after the view is created are not included
+    """
+
+    def __init__(self, signals=None, batch=None, indices=None):
+        self._signals = list(signals) if signals is not None else None
+        self._batch = batch
+        # row numbers in the batch that are part of this view, None for all
+        self._indices = indices
+        self._column_cache = {}
+
+    @property
+    def batch(self):
+        """The columns of every captured signal, built on first access"""
+        if self._batch is None:
+            self._batch = SignalBatch.from_signals(self._signals)
+            self._signals = None
+        return self._batch
+
+    @property
+    def columns(self):
+        return self.batch.columns
+
+    def _raw_column(self, name):
+        """A column's values for the rows in this view, including MISSING"""
+        if name not in self._column_cache:
+            try:
+                values = self.batch.column(name)
+            except KeyError:
+                values = [MISSING] * len(self.batch)
+            if self._indices is not None:
+                values = [values[index] for index in self._indices]
+            self._column_cache[name] = values
+        return self._column_cache[name]
+
+    def column(self, name):
+        """Values of an attribute, skipping signals that don't have it"""
+        return [value for value in self._raw_column(name)
+                if value is not MISSING]
+
+    def _rows(self):
+        if self._indices is None:
+            return range(len(self.batch))
+        return self._indices
+
+    def _subset(self, positions):
+        """A view of the rows at the given positions in this view"""
+        rows = self._rows()
+        return SignalView(batch=self.batch,
+                          indices=[rows[position] for position in positions])
+
+    def filter(self, predicate=None, **equals):
+        """Keep signals whose attributes equal the given keyword values and,
+        if given, for which predicate(row) is True.
+
+        Example:
+            view.filter(status='ok', predicate=lambda row: row.value > 10)
+        """
+        positions = range(len(self))
+        for name, expected in equals.items():
+            values = self._raw_column(name)
+            positions = [position for position in positions
+                         if values[position] == expected]
+        if predicate is not None:
+            batch = self.batch
+            rows = self._rows()
+            positions = [position for position in positions
+                         if predicate(batch[rows[position]])]
+        return self._subset(positions)
+
+    def select(self, *names):
+        """A view with only the given attributes"""
+        return SignalView(batch=SignalBatch(
+            {name: self._raw_column(name) for name in names}))
+
+    def group_by(self, name):
+        """Split the view into one view per distinct value of an attribute
+
+        Returns:
+            dict: attribute value to SignalView. Signals without the
+                attribute are grouped under MISSING.
+        """
+        groups = {}
+        for position, value in enumerate(self._raw_column(name)):
+            groups.setdefault(value, []).append(position)
+        return {value: self._subset(positions)
+                for value, positions in groups.items()}
+
+    def count_by(self, name):
+        """Count the signals for each distinct value of an attribute"""
+        return Counter(self.column(name))
+
+    def count(self):
+        return len(self)
+
+    def sum(self, name):
+        return sum(self.column(name))
+
+    def min(self, name):
+        return min(self.column(name))
+
+    def max(self, name):
+        return max(self.column(name))
+
+    def mean(self, name):
+        values = self.column(name)
+        return sum(values) / len(values) if values else None
+
+    def to_dicts(self):
+        """The signals in this view as dictionaries"""
+        batch = self.batch
+        return [batch[row].to_dict() for row in self._rows()]
+
+    def __len__(self):
+        if self._indices is not None:
+            return len(self._indices)
+        if self._batch is None:
+            return len(self._signals)
+        return len(self._batch)
+
+    def __iter__(self):
+        batch = self.batch
+        for row in self._rows():
+            yield batch[row]
+
+    def __repr__(self):
+        return 'SignalView({} signals)'.format(len(self))
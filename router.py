@@ -1,60 +1,160 @@
-from collections import defaultdict
+from collections import defaultdict, deque
 from copy import copy, deepcopy
-from threading import Event
+from threading import Event, Lock, local
+from time import monotonic
 
+from nio.block.base import Base
+from nio.block.terminals import Terminal, TerminalType
 from nio.router.base import BlockRouter
 from nio.util.threading import spawn
 
+from .graph import ExecutionGraph
+from .processed import ProcessedInputs, tag_input
+
 
 class ServiceTestRouter(BlockRouter):
 
-    def __init__(self, synchronous):
+    def __init__(self, synchronous, dispatch_queue=False, batch_size=0):
+        """Create the router
+
+        Args:
+            synchronous (bool): process signals in the notifying thread
+            dispatch_queue (bool): when synchronous, deliver signals from a
+                queue, breadth first, instead of calling into downstream
+                blocks recursively
+            batch_size (int): with dispatch_queue, merge consecutive queued
+                deliveries to the same block and input while they hold at
+                most this many signals. 0 to never merge.
+        """
         super().__init__()
         self._execution = []
+        self.graph = ExecutionGraph([])
         self._synchronous = synchronous
+        self._dispatch_queue = synchronous and dispatch_queue
+        self._batch_size = batch_size
+        # Per thread queue of deliveries waiting to be made
+        self._dispatch = local()
         self._blocks = {}
         self._processed_signals = defaultdict(list)
-        self.processed_signals_input = \
-            defaultdict(lambda: defaultdict(list))
+        # Runs of (input_id, start, end) over each block's processed signals
+        self._processed_inputs = defaultdict(list)
+        self._processed_lock = Lock()
+        # Views of the processed signals by block and input
+        self.processed_signals_input = ProcessedInputs(
+            self._processed_signals, self._processed_inputs)
+        # Cumulative time each block spent in process_signals, not counting
+        # the time spent in blocks it notified synchronously
+        self.block_times = defaultdict(float)
+        self.deepcopy_count = 0
+        # Per thread stack of the time spent in nested process_signals calls
+        self._nested_times = local()
+        # Set to a SignalTracer to record every delivery between blocks
+        self.tracer = None
 
     def configure(self, context):
         self._execution = context.execution
         self._blocks = context.blocks
+        self.graph = ExecutionGraph(
+            self._execution, self._blocks, self._block_terminals)
         self._setup_processed()
 
+    def _block_terminals(self, block_id):
+        """input and output terminal IDs of a block, None for mocked blocks
+        and blocks that haven't been created"""
+        # keys() leaves out lazy blocks that haven't been created yet
+        if block_id not in self._blocks.keys():
+            return None
+        block = self._blocks[block_id]
+        if not isinstance(block, Base):
+            return None
+        return tuple({terminal.id for terminal in
+                      Terminal.get_terminals_on_class(
+                          block.__class__, terminal_type)}
+                     for terminal_type in (TerminalType.input,
+                                           TerminalType.output))
+
     def notify_signals(self, block, signals, output_id):
         if not signals:
             return
         from_block_name = block.name()
-        all_receivers = [block["receivers"] for block in self._execution
-                         if block["id"] == from_block_name][0]
+        all_receivers = self.graph.receivers.get(from_block_name)
         if not all_receivers:
             return
         # If output_id isn't in receivers, then use default output
         receivers = all_receivers.get(
             output_id, all_receivers.get("__default_terminal_value", []))
+        trace_id = self.tracer.start_trace() if self.tracer else None
         for receiver in receivers:
             receiver_id = receiver["id"]
             input_id = receiver["input"]
-            to_block = self._blocks[receiver_id]
-            # Uncomment if you want debug prints for every notify
-            # receiver_name = to_block.name()
-            # print("{} -> {}".format(from_block_name, receiver_name))
+            clone_start = monotonic()
             try:
                 cloned_signals = deepcopy(signals)
+                self.deepcopy_count += 1
             except Exception:
                 cloned_signals = copy(signals)
-            if input_id == "__default_terminal_value":
-                # don't include input_id if it's default terminal
-                if self._synchronous:
-                    to_block.process_signals(cloned_signals)
-                else:
-                    spawn(to_block.process_signals, cloned_signals)
+            delivery = [from_block_name, receiver_id, input_id,
+                        cloned_signals, trace_id, clone_start,
+                        monotonic() - clone_start]
+            if self._dispatch_queue:
+                self._enqueue(delivery)
             else:
-                if self._synchronous:
-                    to_block.process_signals(cloned_signals, input_id)
-                else:
-                    spawn(to_block.process_signals, cloned_signals, input_id)
+                self._deliver(*delivery)
+        if self._dispatch_queue:
+            self._drain()
+
+    def _deliver(self, from_block_name, receiver_id, input_id, signals,
+                 trace_id, clone_start, clone_time):
+        """call a receiving block's process_signals, or spawn it when
+        asynchronous"""
+        process_signals = self._blocks[receiver_id].process_signals
+        if self.tracer:
+            process_signals = self.tracer.traced(
+                process_signals, trace_id, from_block_name, receiver_id,
+                input_id, len(signals), clone_start, clone_time)
+        if input_id == "__default_terminal_value":
+            # don't include input_id if it's default terminal
+            args = (signals,)
+        else:
+            args = (signals, input_id)
+        if self._synchronous:
+            process_signals(*args)
+        else:
+            spawn(process_signals, *args)
+
+    def _enqueue(self, delivery):
+        """queue a delivery, merging it into the last queued delivery when
+        it goes to the same block and input and the merged batch fits in
+        batch_size. Merged deliveries are traced as the first one.
+        """
+        queue = getattr(self._dispatch, 'queue', None)
+        if queue is None:
+            queue = self._dispatch.queue = deque()
+        if queue and self._batch_size:
+            last = queue[-1]
+            if last[1:3] == delivery[1:3] and \
+                    len(last[3]) + len(delivery[3]) <= self._batch_size:
+                last[3] = list(last[3]) + list(delivery[3])
+                last[6] += delivery[6]
+                return
+        queue.append(delivery)
+
+    def _drain(self):
+        """make queued deliveries in order until none are left. Deliveries
+        queued while draining, by blocks notifying downstream, are made by
+        the outermost drain, so the stack never grows with the service.
+        """
+        queue = getattr(self._dispatch, 'queue', None)
+        if not queue or getattr(self._dispatch, 'draining', False):
+            return
+        self._dispatch.draining = True
+        try:
+            while queue:
+                self._deliver(*queue.popleft())
+        finally:
+            self._dispatch.draining = False
+            # don't leave deliveries behind if a block raised
+            queue.clear()
 
     def _processed_signals_set(self, block_name):
         self._blocks[block_name]._processed_event.set()
@@ -66,12 +166,56 @@ class ServiceTestRouter(BlockRouter):
         """
         def process_wrapper(*args, **kwargs):
             input_id = args[1] if len(args) > 1 else None
-            process_signals(*args, **kwargs)
-            self._processed_signals[block_name].extend(args[0])
-            self.processed_signals_input[block_name][input_id].extend(args[0])
+            self._timed_call(process_signals, block_name, *args, **kwargs)
+            with self._processed_lock:
+                signals = self._processed_signals[block_name]
+                start = len(signals)
+                signals.extend(args[0])
+                tag_input(self._processed_inputs[block_name], input_id,
+                          start, len(signals))
             self._processed_signals_set(block_name)
         return process_wrapper
 
+    def copy_processed_signals(self):
+        """Return copies of the processed signals per block and of the
+        inputs they came in on, that restore_processed_signals can put back
+        """
+        with self._processed_lock:
+            processed = {block_name: list(signals) for block_name, signals
+                         in self._processed_signals.items()}
+            processed_inputs = {
+                block_name: [tuple(tag) for tag in tags]
+                for block_name, tags in self._processed_inputs.items()}
+        return processed, processed_inputs
+
+    def restore_processed_signals(self, processed, processed_inputs):
+        """Replace the processed signals with copies of the given ones"""
+        with self._processed_lock:
+            self._processed_signals.clear()
+            self._processed_inputs.clear()
+            for block_name, signals in processed.items():
+                self._processed_signals[block_name].extend(signals)
+            for block_name, tags in processed_inputs.items():
+                self._processed_inputs[block_name].extend(
+                    list(tag) for tag in tags)
+
+    def _timed_call(self, process_signals, block_name, *args, **kwargs):
+        """call a block's process_signals and add the time spent in it to
+        block_times, excluding time spent in downstream blocks.
+        """
+        stack = getattr(self._nested_times, 'stack', None)
+        if stack is None:
+            stack = self._nested_times.stack = []
+        stack.append(0)
+        start = monotonic()
+        try:
+            process_signals(*args, **kwargs)
+        finally:
+            elapsed = monotonic() - start
+            self.block_times[block_name] += elapsed - stack.pop()
+            if stack:
+                stack[-1] += elapsed
+
     def _setup_processed(self):
         """wrap every block's (including mocked blocks) process_signals
         function with a custom one that calls _processed_signals upon exit.
@@ -79,6 +223,13 @@ class ServiceTestRouter(BlockRouter):
         Also give every block it's own event for processed_signals.
         """
         for block_name, block in self._blocks.items():
-            block.process_signals = self._call_processed(block.process_signals,
-                                                         block_name)
-            block._processed_event = Event()
+            self.setup_block(block_name, block)
+
+    def setup_block(self, block_name, block):
+        """wrap a single block's process_signals and give it an event for
+        processed signals. Used directly for blocks created after the router
+        has been configured.
+        """
+        block.process_signals = self._call_processed(block.process_signals,
+                                                     block_name)
+        block._processed_event = Event()
@@ -1,15 +1,16 @@
 from base64 import b64decode
-from collections import defaultdict
+from collections import Counter, defaultdict
 from copy import copy
 import json
-import jsonschema
 import os
 import os.path
 import pickle
-import re
+import random
 import sys
+import tracemalloc
 import uuid
-from threading import Event
+from threading import Condition
+from time import monotonic
 from unittest.mock import Mock, MagicMock
 
 from nio.block.base import Base
@@ -22,16 +23,32 @@ from nio.testing.test_case import NIOTestCase
 from nio.router.context import RouterContext
 from nio.util.discovery import is_class_discoverable as _is_class_discoverable
 from nio.util.runner import RunnerStatus
-from niocore.core.loader.discover import Discover
 
+from . import _import_start
+from .fixtures import SignalBatch
+from .fuzz import PROFILES, FuzzReport, SchemaSignalGenerator, ShapeTiming, \
+    batch_shape, shrink
+from .config import config_hash, effective_config, replace_env_var, thaw
+from .budget import BUDGETS, BUDGET_ATTRIBUTE, budget, budget_violations
+from .latency import LatencyRecorder
+from .lazy_blocks import LazyBlocks
+from .manifest import MANIFEST_FILE, import_block_class, load_manifest
+from .query import SignalView
 from .router import ServiceTestRouter
+from .snapshot import ServiceSnapshot, get_persisted_state, restore_jobs, \
+    set_persisted_state, snapshot_jobs
+from .tracing import SignalTracer
 from .modules.module_persistence_file.persistence import \
     Persistence as FilePersistence
 from .modules.module_scheduler_synchronous.module import \
     SynchronousSchedulerModule
-from .modules.module_scheduler_synchronous.scheduler import SyncScheduler
-
 
+# Snapshots made by warm_service, by test class and warm up name
+_warm_snapshots = {}
+# Block classes imported through the manifest, by block type
+_manifest_classes = {}
+# Whether the first test to set up printed the cold start time yet
+_cold_start_reported = False
 
 def is_class_discoverable(_class, default_discoverability=True):
     return _is_class_discoverable(_class, default_discoverability)
@@ -48,40 +65,185 @@ class NioServiceTestCase(NIOTestCase):
             Get published signals with `published_signals`.
         * If you need to change block config for a test, override
             `override_block_configs`
-        * Use `wait_for_published_signals(self, count=0, timeout=1)` instead
-            of sleep
+        * Use `wait_for_published_signals(self, count=0, timeout=1,
+            topic=None)` instead of sleep
         * Set nio environment variables with `env_vars`.
         * Mock blocks with `mock_blocks` by mapping block names to mocked
             process_signals method for that block.
         * Test by notifying signals from a block with `notify_signals`
+        * Fuzz a service with signals generated from the topic schema with
+            `fuzz_publish`
+        * Record test timings to a SQLite file by setting `timing_db` or the
+            SERVICE_TESTS_TIMING_DB environment variable
+        * Set `lazy_blocks` to only create blocks when they are first used
+        * Fail tests that use too many resources by setting `max_wall_time`,
+            `max_peak_memory`, `max_block_time` or `max_deepcopies`, or with
+            the `budget` decorator on a test method
+        * Set `trace_signals` to record every delivery of signals between
+            blocks, export them with `export_signal_trace`
+        * Set `strict_execution` to fail tests when the service execution
+            has problems, see `execution_graph`
+        * Set `dispatch_queue` to route signals breadth first from a queue
+            instead of recursively, for deep or cyclic synchronous services
+        * Write a block manifest with `python service_tests/manifest.py` to
+            only import the blocks a service uses
+        * Set `measure_latency` to record how long signals take from
+            `publish_signals` or `notify_signals` to being published, see
+            `latency_histogram`
+        * Save a started service's state with `snapshot_service` and put it
+            back with `restore_service`, or use `warm_service` to only run
+            an expensive warm up once
     """
 
     service_name = None
     auto_start = True
     synchronous = True
+    lazy_blocks = False
+    # Resource budgets, checked in tearDown. None means no budget
+    max_wall_time = None  # seconds from setUp to tearDown
+    max_peak_memory = None  # bytes, as traced by tracemalloc
+    max_block_time = None  # dict of block name/ID to processing seconds
+    max_deepcopies = None  # signal deep copies made by the router
+    trace_signals = False
+    # How many block to block deliveries to keep when tracing signals
+    trace_capacity = 10000
+    # Fail in setUp if the execution graph has any problems
+    strict_execution = False
+    # Synchronous tests only: deliver signals from a queue instead of
+    # recursively, merging consecutive deliveries to the same block input
+    # up to dispatch_batch_size signals (0 to never merge)
+    dispatch_queue = False
+    dispatch_batch_size = 0
+    # Synchronous tests only: also fire scheduled jobs in real time from a
+    # thread. Without it jobs only fire when jumping ahead, and tests can
+    # run in parallel threads
+    scheduler_thread = True
+    # Path of a SQLite file to append each test's timings to, defaults to
+    # the SERVICE_TESTS_TIMING_DB environment variable
+    timing_db = None
+    # Stamp signals injected with publish_signals and notify_signals and
+    # record how long they take to be published, per input/output topic
+    measure_latency = False
 
     def __init__(self, methodName='runTests'):
         super().__init__(methodName)
         self._blocks = {}
-        self._router = ServiceTestRouter(self.synchronous)
-        # Set this Scheduler object to be used in tests for jump_ahead
-        self._scheduler = SyncScheduler if self.synchronous else None
+        self._router = ServiceTestRouter(
+            self.synchronous, self.dispatch_queue, self.dispatch_batch_size)
+        if self.trace_signals:
+            self._router.tracer = SignalTracer(self.trace_capacity)
+        # Set this Scheduler object to be used in tests for jump_ahead,
+        # every test gets its own once modules are set up
+        self._scheduler = None
         # Subscribe to publishers in the service
         self._subscribers = {}
         # Capture published signals for assertions
         self.published_signals = defaultdict(list)
-        # Set an event when those publishers publish signals
-        self._publisher_event = Event()
+        # Signals published since the service started, per topic and in
+        # total, and a condition notified when they change
+        self.published_counts = Counter()
+        self.published_total = 0
+        self._published_condition = Condition()
+        # Seconds spent in wait_for_published_signals
+        self.published_wait_time = 0
         # Allow tests to publish signals to any subscriber
         self._publishers = {}
         # Json schema for publisher and subscriber validation
         self._schema = {}
         self._schema_file = None
+        # Block classes are only discovered once a real block is needed
+        self._block_classes = None
+        # Time spent setting up and configuring blocks
+        self.block_setup_time = 0
+        # Time spent importing block classes
+        self.block_import_time = 0
+        self.block_configure_times = {}
+        # Service block ID to the block config it was created from, and the
+        # hash of the effective config it was configured with
+        self._service_block_configs = {}
+        self._block_config_keys = {}
+        # Measured resource usage of the test, set in tearDown
+        self.resource_usage = {}
+        self.setup_time = 0
+        self._started_tracemalloc = False
+        self.latency = LatencyRecorder() if self.measure_latency else None
 
     @property
     def processed_signals(self):
         return self._router._processed_signals
 
+    def signals(self, topic=None, block=None, input_id=None):
+        """Query captured signals as columns.
+
+        Args:
+            topic (str): query signals published on this topic
+            block (str): query signals processed by this block name or ID
+            input_id (str): with block, only signals processed on this input
+
+        With no arguments, signals published on every topic are queried.
+
+        Returns:
+            SignalView: a view of the signals captured so far
+        """
+        if topic is not None and block is not None:
+            raise ValueError('Query either a topic or a block, not both')
+        if block is not None:
+            block_id = self.get_block_id(block)
+            if input_id is not None:
+                signals = self._router.processed_signals_input.get(
+                    block_id, {}).get(input_id, [])
+            else:
+                signals = self.processed_signals.get(block_id, [])
+        elif topic is not None:
+            signals = self.published_signals.get(topic, [])
+        else:
+            signals = [signal for topic_signals in
+                       self.published_signals.values()
+                       for signal in topic_signals]
+        return SignalView(signals)
+
+    @property
+    def signal_trace(self):
+        """The recorded deliveries between blocks when `trace_signals` is
+        set, as a list of tracing.Hop, oldest first."""
+        if self._router.tracer is None:
+            return []
+        return list(self._router.tracer.hops)
+
+    def latency_histogram(self, source=None, topic=None):
+        """The latencies of signals from being injected to being published
+        when `measure_latency` is set.
+
+        Args:
+            source (str): only signals published to this topic, or notified
+                from this block name or ID, by the test
+            topic (str): only signals the service published on this topic
+
+        Returns:
+            latency.LatencyHistogram: with percentile(), mean, min and max
+        """
+        if self.latency is None:
+            raise ValueError(
+                'Latency is not measured, set measure_latency = True')
+        if source is not None and source not in self.subscriber_topics():
+            source = self.get_block_id(source)
+        return self.latency.histogram(source, topic)
+
+    def export_latency(self, file_path):
+        """Write the latency histograms of every input/output pair as
+        JSON"""
+        if self.latency is None:
+            raise ValueError(
+                'Latency is not measured, set measure_latency = True')
+        self.latency.export(file_path)
+
+    def export_signal_trace(self, file_path):
+        """Write the signal trace as Chrome trace-event JSON, which can be
+        opened in Perfetto or chrome://tracing"""
+        if self._router.tracer is None:
+            raise ValueError('Signal tracing is off, set trace_signals = True')
+        self._router.tracer.export(file_path)
+
     def publisher_topics(self):
         """Topics this service publishes to"""
         return []
@@ -93,18 +255,46 @@ class NioServiceTestCase(NIOTestCase):
     def publish_signals(self, topic, signals):
         """publish signals to a given topic.
         Does not add to self.published_signals
+
+        signals can be a list of signals or a SignalBatch
         """
         self.schema_validate(signals, topic)
-        self._publishers[topic].send(signals)
+        if isinstance(signals, SignalBatch):
+            signals = signals.to_signals()
+        self._send_signals(topic, signals)
+
+    def _send_signals(self, topic, signals):
+        """send signals to the topic's subscribers, stamping them when
+        measuring latency"""
+        if self.latency is None:
+            self._publishers[topic].send(signals)
+            return
+        self.latency.stamp(signals, topic)
+        try:
+            self._publishers[topic].send(signals)
+        finally:
+            self.latency.end_ingress()
 
     def notify_signals(self, block_name, signals,
                        terminal="__default_terminal_value"):
         """notify signals from a block. Adds to a blocks processed signals,
         but does not call block.process_signals.
+
+        signals can be a list of signals or a SignalBatch
         """
+        if isinstance(signals, SignalBatch):
+            signals = signals.to_signals()
         block_id = self.get_block_id(block_name)
-        self._router.notify_signals(
-            self._blocks[block_id], signals, terminal)
+        if self.latency is None:
+            self._router.notify_signals(
+                self._blocks[block_id], signals, terminal)
+            return
+        self.latency.stamp(signals, block_id)
+        try:
+            self._router.notify_signals(
+                self._blocks[block_id], signals, terminal)
+        finally:
+            self.latency.end_ingress()
 
     def mock_blocks(self):
         """Optionally create a mocked block class instead of the real thing
@@ -138,7 +328,21 @@ class NioServiceTestCase(NIOTestCase):
         return FilePersistence()
 
     def setUp(self):
+        self._test_start = monotonic()
+        self._budgets = self._get_budgets()
+        if tracemalloc.is_tracing():
+            # tracing was started before this test, only measure the peak
+            # from here on
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.clear_traces()
+        elif self._budgets['max_peak_memory'] is not None:
+            tracemalloc.start()
+            self._started_tracemalloc = True
         super().setUp()
+        if self.synchronous:
+            self._scheduler = self._scheduler_module.scheduler
         self._invalid_topics = {}
         persistence = self.__setup_file_persistence()
         self.block_configs = {}
@@ -151,11 +355,25 @@ class NioServiceTestCase(NIOTestCase):
         self.service_config = self.get_service_config(self.service_name)
         self._setup_block_persistence()
         self._setup_blocks()
+        self._check_execution()
         self._setup_pubsub()
         self._setup_json_schema()
         # Start blocks
         if self.auto_start:
             self.start()
+        self.setup_time = monotonic() - self._test_start
+        self._report_cold_start()
+
+    def _report_cold_start(self):
+        """print how long the first test of the run took to get going"""
+        global _cold_start_reported
+        if _cold_start_reported:
+            return
+        _cold_start_reported = True
+        print('Service tests cold start {:.4f}s: imports {:.4f}s, first setUp '
+              '{:.4f}s of which importing blocks {:.4f}s'.format(
+                  _import_time + self.setup_time, _import_time,
+                  self.setup_time, self.block_import_time))
 
     def _find_resource(self, resource_identifier, resources):
         """ Find a resource in a list of resources based on identifier
@@ -208,7 +426,9 @@ class NioServiceTestCase(NIOTestCase):
     def get_module(self, module_name):
         """ Override to use the file persistence and scheduler """
         if module_name == "scheduler" and self.synchronous:
-            return SynchronousSchedulerModule()
+            self._scheduler_module = \
+                SynchronousSchedulerModule(self.scheduler_thread)
+            return self._scheduler_module
         else:
             return super().get_module(module_name)
 
@@ -224,7 +444,9 @@ class NioServiceTestCase(NIOTestCase):
 
     def _setup_blocks(self):
         # Instantiate and configure blocks
-        blocks = Discover.discover_classes('blocks', Base, is_class_discoverable)
+        setup_start = monotonic()
+        if self.lazy_blocks:
+            self._blocks = LazyBlocks(self._create_block)
         service_block_ids = [service_block["id"] for service_block in
                                self.service_config.get("execution", [])]
         service_block_mappings = {}
@@ -244,17 +466,143 @@ class NioServiceTestCase(NIOTestCase):
             block_config["name"] = service_block_id
             block_config["id"] = block_config.get('id', uuid.uuid4())
             self._override_local_pubsub_block(block_config)
-            # instantiate the block
-            block = self._init_block(block_config, blocks)
-            block_config = self._override_block_config(block_config)
-            block_config = self._replace_env_vars(block_config)
-            block.configure(BlockContext(
-                self._router, block_config, 'TestSuite', ''))
-            self._blocks[service_block_id] = block
+            if self.lazy_blocks and not self._create_eagerly(block_config):
+                # instantiate the block the first time it is used
+                self._blocks.defer(service_block_id, block_config)
+            else:
+                self._blocks[service_block_id] = \
+                    self._create_block(service_block_id, block_config)
         # Configure router
         self._router.configure(RouterContext(
             execution=self.service_config.get("execution", []),
             blocks=self._blocks))
+        self.block_setup_time = monotonic() - setup_start
+
+    def _create_block(self, service_block_id, block_config):
+        """Instantiate and configure a single service block.
+
+        For lazy blocks this is called the first time the block is used, in
+        which case the block is also registered with the router and started
+        if the service is already running.
+        """
+        configure_start = monotonic()
+        block = self._init_block(block_config)
+        self._service_block_configs[service_block_id] = block_config
+        self._configure_block(service_block_id, block)
+        if self.lazy_blocks:
+            self._router.setup_block(service_block_id, block)
+            if self._router.status.is_set(RunnerStatus.starting) or \
+                    self._router.status.is_set(RunnerStatus.started):
+                block.start()
+        self.block_configure_times[service_block_id] = \
+            monotonic() - configure_start
+        return block
+
+    def _configure_block(self, service_block_id, block):
+        """Configure a block with its effective config, a fresh copy of
+        the memoized config so blocks can't change it for other tests"""
+        key, config = self._effective_block_config(service_block_id)
+        block.configure(BlockContext(
+            self._router, thaw(config), 'TestSuite', ''))
+        self._block_config_keys[service_block_id] = key
+
+    def _effective_block_config(self, service_block_id):
+        """(hash, frozen config) of a block's config with overrides and
+        environment variables applied"""
+        block_config = self._service_block_configs[service_block_id]
+        return effective_config(block_config,
+                                self._block_overrides(block_config),
+                                self.env_vars())
+
+    def reconfigure_blocks(self):
+        """Configure blocks again if their effective config changed since
+        they were configured, e.g. because `override_block_configs` or
+        `env_vars` return something else now. Blocks whose config is the
+        same are left alone.
+
+        Returns:
+            list: IDs of the blocks that were reconfigured
+        """
+        reconfigured = []
+        for service_block_id, block in list(self._blocks.items()):
+            key, _ = self._effective_block_config(service_block_id)
+            if key != self._block_config_keys.get(service_block_id):
+                self._configure_block(service_block_id, block)
+                reconfigured.append(service_block_id)
+        return reconfigured
+
+    def _create_eagerly(self, block_config):
+        """Return True for blocks that must exist even with `lazy_blocks`.
+
+        Subscribers are never routed to, signals enter the service through
+        them, so they are always created. Override this to also create
+        blocks that generate their own signals (e.g. Simulators).
+        """
+        return block_config['type'] in ('Subscriber', 'LocalSubscriber')
+
+    def _get_block_classes(self):
+        """Discover the project's block classes the first time they are
+        needed. Services whose blocks are all mocked never import them.
+        """
+        if self._block_classes is None:
+            from niocore.core.loader.discover import Discover
+            self._block_classes = Discover.discover_classes(
+                'blocks', Base, is_class_discoverable)
+        return self._block_classes
+
+    def _get_block_class(self, block_type):
+        """The class of a block type. Only that block's module is imported
+        when the project has a block manifest that knows the type, otherwise
+        every block class is discovered.
+        """
+        block_class = _manifest_classes.get(block_type)
+        if block_class is None:
+            manifest = load_manifest(os.path.abspath(
+                os.path.join(__file__, "../../", MANIFEST_FILE)))
+            if manifest is not None:
+                block_class = import_block_class(
+                    manifest, block_type, Base, is_class_discoverable)
+            if block_class is not None:
+                _manifest_classes[block_type] = block_class
+            else:
+                block_class = [block for block in self._get_block_classes()
+                               if block.__name__ == block_type][0]
+        return block_class
+
+    def block_setup_report(self):
+        """Return how long block setup took and which blocks were skipped.
+
+        Skipped blocks are lazy blocks that were never used by the test, so
+        they were never instantiated or configured.
+        """
+        setup_time = self.block_setup_time
+        if self.lazy_blocks:
+            # lazy blocks are configured during the test, not in setUp
+            setup_time += sum(self.block_configure_times.values())
+        return {
+            'setup_time': setup_time,
+            'configure_times': dict(self.block_configure_times),
+            'skipped': self._blocks.pending if self.lazy_blocks else [],
+        }
+
+    @property
+    def execution_graph(self):
+        """The service's compiled graph.ExecutionGraph, with its problems,
+        topological order, cycles, fan out and depth"""
+        return self._router.graph
+
+    def _check_execution(self):
+        """Fail fast on problems in the service execution when
+        `strict_execution` is set. Receivers that aren't blocks in the service
+        are always reported since routing signals to them raises.
+        """
+        problems = self.execution_graph.problems()
+        if self.strict_execution and problems:
+            self.fail('Problems found in the execution of service {}:\n  {}'
+                      .format(self.service_name, '\n  '.join(problems)))
+        for from_id, to_id in self.execution_graph.missing_receivers:
+            print('Block {} sends signals to {}, which is not a block in the '
+                  'service'.format(from_id, to_id))
 
     def _override_local_pubsub_block(self, block_config):
         """ Set local topic prefixes to empty strings for testing.
@@ -271,13 +619,14 @@ class NioServiceTestCase(NIOTestCase):
         # Start blocks
         if self._router.status != RunnerStatus.started:
             self._router.status = RunnerStatus.starting
-            for block in self._blocks:
+            # lazy blocks may get created while other blocks start
+            for block in list(self._blocks):
                 self._blocks[block].start()
             self._router.status = RunnerStatus.started
         else:
             print('Already started this service, cannot start again.')
 
-    def _init_block(self, block_config, blocks):
+    def _init_block(self, block_config):
         """create a mocked block for each block given in self.mock_blocks."""
         block = None
         for mock_block_key, mock_block_value in self.mock_blocks().items():
@@ -308,59 +657,117 @@ class NioServiceTestCase(NIOTestCase):
 
         if block is None:
             # Wasn't mocked, instantiate the block the normal way
-            block = [block for block in blocks if
-                     block.__name__ == block_config["type"]][0]()
+            import_start = monotonic()
+            block_class = self._get_block_class(block_config["type"])
+            self.block_import_time += monotonic() - import_start
+            block = block_class()
         return block
 
     def _replace_env_vars(self, config):
-        """Return config with environment variables swapped out"""
-        for var in self.env_vars():
-            config = \
-                self._replace_env_var(config, var, self.env_vars()[var])
-        return config
-
-    def _replace_env_var(self, config, name, value):
-        for property in config:
-            if isinstance(config[property], str):
-                config[property] = re.sub(
-                    "\\[\\[\\s*" + name + "\\s*\\]\\]",
-                    # escape backslashes for re.sub, e.g. in Windows paths
-                    str(value).replace('\\', '\\\\'),
-                    config[property])
-            elif isinstance(config[property], dict):
-                self._replace_env_var(config[property], name, value)
-            elif isinstance(config[property], list):
-                new_list = []
-                for item in config[property]:
-                    if isinstance(item, str):
-                        new_list.append(
-                            re.sub(
-                                "\\[\\[\\s*" + name + "\\s*\\]\\]",
-                                # escape backslashes
-                                str(value).replace('\\', '\\\\'),
-                                item))
-                    elif isinstance(item, dict):
-                        new_list.append(
-                                self._replace_env_var(item, name, value))
-                config[property] = new_list
+        """Return a copy of config with environment variables swapped out"""
+        for var, value in self.env_vars().items():
+            config = replace_env_var(config, var, value)
         return config
 
     def tearDown(self):
+        self._measure_resources()
         # Tear down publishers and subscribers for tests
         self._teardown_pubsub()
         # Stop blocks
-        for block in self._blocks:
+        for block in list(self._blocks):
             self._blocks[block].stop()
+        if self.lazy_blocks:
+            report = self.block_setup_report()
+            print('Lazy block setup took {:.4f}s, skipped blocks: {}'
+                  .format(report['setup_time'], report['skipped']))
 
         # set runner status
         self._router.status = RunnerStatus.stopped
 
         super().tearDown()
+        # after cleaning up, so a database that can't be written doesn't
+        # leave blocks running
+        self._record_timings()
 
         # fail if there were topics found invalid and the test is not already
         # failing
         if self._invalid_topics and not self._outcome.errors:
             raise AssertionError(self._invalid_topics)
+        self._check_budgets()
+
+    def _get_budgets(self):
+        """Budgets for this test, the `budget` decorator on the test method
+        takes precedence over class attributes."""
+        budgets = {name: getattr(self, name) for name in BUDGETS}
+        test_method = getattr(self, self._testMethodName, None)
+        budgets.update(getattr(test_method, BUDGET_ATTRIBUTE, {}))
+        return budgets
+
+    def _measure_resources(self):
+        """Record the resources used by the test before tearing down"""
+        peak_memory = 0
+        if tracemalloc.is_tracing():
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.resource_usage = {
+            'wall_time': monotonic() - self._test_start,
+            'peak_memory': peak_memory,
+            'block_times': dict(self._router.block_times),
+            'deepcopies': self._router.deepcopy_count,
+            'signals_processed': sum(
+                len(signals) for signals in self.processed_signals.values()),
+            'signals_published': self.published_total,
+            'published_wait_time': self.published_wait_time,
+        }
+
+    def _record_timings(self):
+        """Append this test's timings to the timing database, if any.
+        Database errors are reported and don't fail the test."""
+        path = self.timing_db or os.environ.get('SERVICE_TESTS_TIMING_DB')
+        if not path:
+            return
+        # sqlite3 and subprocess are only imported when recording timings
+        import sqlite3
+        from .timing_db import TimingDatabase, current_commit
+        test_dir = os.path.dirname(
+            os.path.abspath(sys.modules[self.__class__.__module__].__file__))
+        try:
+            database = TimingDatabase(path)
+        except sqlite3.Error as error:
+            print('Could not open timing database {}: {}'.format(path, error))
+            return
+        try:
+            database.record(
+                self.id(),
+                service=self.service_name,
+                git_commit=current_commit(test_dir),
+                setup_time=self.setup_time,
+                block_setup_time=self.block_setup_report()['setup_time'],
+                wall_time=self.resource_usage['wall_time'],
+                signals_processed=self.resource_usage['signals_processed'],
+                signals_published=self.resource_usage['signals_published'],
+                configure_times=self.block_configure_times,
+                process_times=self.resource_usage['block_times'])
+        except sqlite3.Error as error:
+            print('Could not record timings of {} in {}: {}'.format(
+                self.id(), path, error))
+        finally:
+            database.close()
+
+    def _check_budgets(self):
+        """fail if the test used more resources than its budgets allow and
+        the test is not already failing"""
+        budgets = dict(self._budgets)
+        if budgets['max_block_time']:
+            budgets['max_block_time'] = {
+                self.get_block_id(block): limit
+                for block, limit in budgets['max_block_time'].items()}
+        violations = budget_violations(budgets, self.resource_usage)
+        if violations and not self._outcome.errors:
+            raise AssertionError('Resource budgets exceeded:\n  {}'.format(
+                '\n  '.join(violations)))
 
     def _setup_pubsub(self):
         # Supscribe to published signals
@@ -378,11 +785,20 @@ class NioServiceTestCase(NIOTestCase):
 
     def _teardown_pubsub(self):
         self.published_signals.clear()
+        self._reset_published_counts()
         for subscriber in self._subscribers:
             self._subscribers[subscriber].close()
         for publisher in self._publishers:
             self._publishers[publisher].close()
-        self._publisher_event = Event()
+
+    def _reset_published_counts(self):
+        """count the signals in published_signals again"""
+        with self._published_condition:
+            self.published_counts = Counter({
+                topic: len(signals)
+                for topic, signals in self.published_signals.items()})
+            self.published_total = sum(self.published_counts.values())
+            self._published_condition.notify_all()
 
     def _published_signals(self, signals, topic=None):
         # Save published signals for assertions
@@ -394,25 +810,119 @@ class NioServiceTestCase(NIOTestCase):
         except Exception:
             pass
         self.schema_validate(signals, topic)
-        self.published_signals[topic].extend(signals)
-        self._publisher_event.set()
-        self._publisher_event.clear()
+        if self.latency is not None:
+            self.latency.record(signals, topic)
+        with self._published_condition:
+            self.published_signals[topic].extend(signals)
+            self.published_counts[topic] += len(signals)
+            self.published_total += len(signals)
+            self._published_condition.notify_all()
+
+    def snapshot_service(self):
+        """Capture the state of the running service: persisted values of
+        every created block, the synchronous scheduler's jobs and offset,
+        and the signals captured so far. Only jobs that call a method of a
+        service block are kept, other jobs are reported and left out.
+
+        Returns:
+            ServiceSnapshot: can be restored with `restore_service`, in this
+                test or another test of the same service
+        """
+        persisted = {}
+        for block_id, block in self._blocks.items():
+            state = get_persisted_state(block)
+            if state is not None:
+                persisted[block_id] = state
+        offset, jobs = 0, []
+        if self._scheduler is not None:
+            # jobs of the real scheduler in asynchronous tests are not kept
+            offset = self._scheduler.offset
+            jobs = snapshot_jobs(self._scheduler, self._blocks)
+        processed, processed_inputs = self._router.copy_processed_signals()
+        return ServiceSnapshot(
+            self._config_fingerprint(), persisted, offset, jobs,
+            {topic: list(signals)
+             for topic, signals in self.published_signals.items()},
+            processed, processed_inputs)
+
+    def restore_service(self, snapshot):
+        """Put the service back into the state of a snapshot.
+
+        Blocks get their persisted values back and scheduled jobs that call
+        a block method are replaced by the snapshot's jobs, due the same
+        number of seconds from now as when the snapshot was taken. Jobs that
+        are still scheduled keep their IDs so they can be cancelled as
+        usual. Other jobs, like partials the blocks scheduled when they
+        started, are kept.
+        """
+        if snapshot.fingerprint != self._config_fingerprint():
+            raise ValueError('Snapshot was taken with a different service or '
+                             'block configuration')
+        for block_id, state in snapshot.persisted.items():
+            set_persisted_state(self._blocks[block_id], state)
+        if self._scheduler is not None:
+            restore_jobs(self._scheduler, snapshot, self._blocks)
+        self.published_signals.clear()
+        for topic, signals in snapshot.published_signals.items():
+            self.published_signals[topic].extend(signals)
+        self._reset_published_counts()
+        self._router.restore_processed_signals(
+            snapshot.processed_signals, snapshot.processed_signals_input)
 
-    def _override_block_config(self, block_config):
-        """override a blocks config with the given block config"""
-        new_block_config = {}
+    def warm_service(self, warm_up, cache_file=None, key=None):
+        """Run warm_up once per test class and restore its result after.
+
+        The first test to call this runs warm_up and snapshots the service,
+        later tests of the class with the same configuration restore that
+        snapshot instead. With
+        cache_file the snapshot is also saved to disk, and reused by later
+        test runs while the service and block configuration don't change.
+
+        Args:
+            warm_up (callable): brings the started service into the state
+                tests need, called without arguments
+            cache_file (str): optional, file to save the snapshot to
+            key (str): identifies the warm up, defaults to its name
+
+        Returns:
+            ServiceSnapshot: the warm state
+        """
+        fingerprint = self._config_fingerprint()
+        # tests of a class can override block configs or env vars
+        key = (type(self), key or getattr(warm_up, '__qualname__', warm_up),
+               fingerprint)
+        snapshot = _warm_snapshots.get(key)
+        if snapshot is None and cache_file and os.path.isfile(cache_file):
+            snapshot = ServiceSnapshot.load(cache_file)
+            if snapshot.fingerprint != fingerprint:
+                # the configuration changed since the file was written
+                snapshot = None
+        if snapshot is None:
+            warm_up()
+            snapshot = self.snapshot_service()
+            if cache_file:
+                snapshot.save(cache_file)
+        else:
+            self.restore_service(snapshot)
+        _warm_snapshots[key] = snapshot
+        return snapshot
+
+    def _config_fingerprint(self):
+        return config_hash(
+            self.service_config, self.block_configs,
+            self.override_block_configs(), self.env_vars())
+
+    def _block_overrides(self, block_config):
+        """the properties override_block_configs overrides for a block"""
         # Find the new block config they want, we need to check name and id
         for bc_key, bc_val in self.override_block_configs().items():
             try:
                 if self.get_block_id(bc_key) == block_config['id']:
-                    new_block_config = bc_val
-                    break
+                    return bc_val
             except KeyError:
                 # ignore invalid keys in the override block config dict here
                 pass
-        for property in new_block_config:
-            block_config[property] = new_block_config[property]
-        return block_config
+        return {}
 
     def wait_for_processed_signals(
             self, block_name, count=0, timeout=1, input_id=None):
@@ -432,23 +942,33 @@ class NioServiceTestCase(NIOTestCase):
                 if not self._blocks[block_id]._processed_event.wait(timeout):
                     return
 
-    def wait_for_published_signals(self, count=0, timeout=1):
+    def wait_for_published_signals(self, count=0, timeout=1, topic=None):
         """Wait for the specified number of signals to be published
 
-        If no count is specified, then wait for the next signals to be
-        published. If no signals are published before the timeout, then fail
-        the test.
+        count is the number of signals published since the service started,
+        on topic if one is given or else on all topics. If no count is
+        specified, then wait for the next signals to be published. Returns
+        once the count is reached or the timeout has passed.
 
-        Either returns after successfully waiting or fails an assertion
+        Returns:
+            float: the seconds actually waited, also added up in
+                `published_wait_time`
         """
-        if not count:
-            # Wait for next publisher event
-            self._publisher_event.wait(timeout)
-        else:
-            # Wait for specified number of signals
-            while count > len(self.published_signals):
-                if not self._publisher_event.wait(timeout):
-                    return
+        start = monotonic()
+        with self._published_condition:
+            if not count:
+                # Wait for the next signals
+                count = self._published_count(topic) + 1
+            self._published_condition.wait_for(
+                lambda: self._published_count(topic) >= count, timeout)
+        waited = monotonic() - start
+        self.published_wait_time += waited
+        return waited
+
+    def _published_count(self, topic=None):
+        if topic is None:
+            return self.published_total
+        return self.published_counts[topic]
 
     def command_block(self, block_name, command_name, **kwargs):
         """call a specified blocks command with given keyword arguments"""
@@ -499,28 +1019,34 @@ class NioServiceTestCase(NIOTestCase):
             self._schema = {self._replace_env_vars({'topic': topic})['topic']:
                             self._schema[topic] for topic in self._schema}
 
+    def _schema_validate_args(self):
+        import jsonschema
+        validate_args = {
+            # Add a resolver so we can use references in our
+            # schema file
+            'resolver': jsonschema.RefResolver(
+                'file:///{}/'.format(
+                    os.path.dirname(self._schema_file)
+                    .replace("\\", "/")),
+                self._schema),
+        }
+        if hasattr(jsonschema, 'draft4_format_checker'):
+            validate_args['format_checker'] = \
+                jsonschema.draft4_format_checker
+        return validate_args
+
     def schema_validate(self, signals, topic=None):
         """validate each signal in a list against the given json schema.
         Update any error information to be collected at the end of the test."""
         if topic in self._schema:
+            # only tests with a topic schema need jsonschema
+            import jsonschema
             for signal in signals:
                 try:
-                    validate_args = {
-                        # Add a resolver so we can use references in our
-                        # schema file
-                        'resolver': jsonschema.RefResolver(
-                            'file:///{}/'.format(
-                                os.path.dirname(self._schema_file)
-                                .replace("\\", "/")),
-                            self._schema),
-                    }
-                    if hasattr(jsonschema, 'draft4_format_checker'):
-                        validate_args['format_checker'] = \
-                            jsonschema.draft4_format_checker
                     jsonschema.validate(
                         signal.to_dict(),
                         self._schema[topic],
-                        **validate_args,
+                        **self._schema_validate_args()
                     )
 
                 except Exception as e:
@@ -531,13 +1057,103 @@ class NioServiceTestCase(NIOTestCase):
                         {topic: " ".join(str(e).replace("\n", " ").split())}
                     )
 
+    def _matches_schema(self, signal_dict, topic):
+        """whether a signal dictionary is valid for a topic, without
+        recording anything"""
+        import jsonschema
+        try:
+            jsonschema.validate(signal_dict, self._schema[topic],
+                                **self._schema_validate_args())
+        except Exception:
+            return False
+        return True
+
+    def fuzz_publish(self, topic, batch_size=100, batches_per_profile=3,
+                     profiles=None, seed=None, check=None,
+                     outlier_factor=10):
+        """Publish signals generated from the topic's schema in
+        topic_schema.json and record the service's throughput per input shape.
+
+        Each profile in fuzz.PROFILES stresses a different shape of input
+        (huge lists, deep nesting, long strings) within the limits the schema
+        allows. Shapes that are more than outlier_factor times slower per
+        signal than the median are reported as outliers.
+
+        If publishing a batch raises, or check raises, the batch is shrunk to
+        a small failing example and the test fails with it and the seed.
+
+        Args:
+            topic (str): a subscriber topic with a schema
+            batch_size (int): signals generated per batch
+            batches_per_profile (int): batches published per profile
+            profiles (list): names of the profiles to use, defaults to all
+            seed: seed to reproduce a previous run
+            check (callable): optional, called after each batch to assert on
+                the service's state
+            outlier_factor (float): how much slower than the median a shape
+                is before it is an outlier
+
+        Returns:
+            FuzzReport: the throughput per shape
+        """
+        if topic not in self._schema:
+            raise ValueError('Topic {} has no schema in topic_schema.json'
+                             .format(topic))
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        generator = SchemaSignalGenerator(self._schema, seed)
+        report = FuzzReport(topic, seed, outlier_factor)
+        for profile in profiles or sorted(PROFILES):
+            for _ in range(batches_per_profile):
+                values = [generator.generate(self._schema[topic], profile)
+                          for _ in range(batch_size)]
+                valid = [value for value in values
+                         if self._matches_schema(value, topic)]
+                report.skipped += len(values) - len(valid)
+                if not valid:
+                    continue
+                error, elapsed = self._fuzz_batch(topic, valid, check)
+                if error is not None:
+                    smallest = shrink(valid, lambda candidate: all(
+                        self._matches_schema(value, topic)
+                        for value in candidate) and self._fuzz_batch(
+                            topic, candidate, check)[0] is not None)
+                    raise AssertionError(
+                        'Fuzzing topic {} with seed {} failed: {!r}\n'
+                        'Smallest failing signals: {}'.format(
+                            topic, seed, error, smallest))
+                report.timings.append(ShapeTiming(
+                    profile, batch_shape(valid), len(valid), elapsed))
+        if report.outliers():
+            print(report)
+        return report
+
+    def _fuzz_batch(self, topic, values, check):
+        """publish signal dictionaries, return the exception raised, if any,
+        and how long publishing took. The values already match the topic's
+        schema, and only sending them to the service is timed."""
+        signals = SignalBatch.from_dicts(values).to_signals()
+        start = monotonic()
+        try:
+            self._send_signals(topic, signals)
+        except Exception as e:
+            return e, monotonic() - start
+        elapsed = monotonic() - start
+        if check is not None:
+            try:
+                check()
+            except Exception as e:
+                return e, elapsed
+        return None, elapsed
+
     def assert_num_signals_published(self, expected, topic=None):
         """asserts that the amount of published signals is equal to expected"""
         if not isinstance(expected, int):
             raise TypeError('Amount of published signals can only be an int. '
                             'Got type {}: {}'.format(type(expected), expected))
         if topic is None:
-            actual = len(self.published_signals)
+            actual = sum(len(signals)
+                         for signals in self.published_signals.values())
         else:
             actual = len(self.published_signals[topic])
         if not actual == expected:
@@ -563,6 +1179,59 @@ class NioServiceTestCase(NIOTestCase):
             raise AssertionError('Amount of processed signals not equal to {}.'
                                  ' Actual: {}'.format(expected, actual))
 
+    def assert_column_monotonic(self, view, column, decreasing=False,
+                                strict=False):
+        """asserts that an attribute never decreases (or never increases)
+        across the signals of a SignalView, e.g. self.signals(topic='x')
+        """
+        values = view.column(column)
+        for index in range(1, len(values)):
+            previous, value = values[index - 1], values[index]
+            if decreasing:
+                in_order = value < previous if strict else value <= previous
+            else:
+                in_order = value > previous if strict else value >= previous
+            if not in_order:
+                raise AssertionError(
+                    'Column {} is not {}monotonically {} at index {}: {} '
+                    'followed by {}'.format(
+                        column, 'strictly ' if strict else '',
+                        'decreasing' if decreasing else 'increasing',
+                        index, previous, value))
+
+    def assert_column_sum(self, view, column, expected, places=None):
+        """asserts that an attribute sums to expected across the signals
+        of a SignalView. Use places to compare floats.
+        """
+        actual = view.sum(column)
+        if places is not None:
+            self.assertAlmostEqual(
+                actual, expected, places=places,
+                msg='Sum of column {} not equal to {}. Actual: {}'.format(
+                    column, expected, actual))
+        elif not actual == expected:
+            raise AssertionError(
+                'Sum of column {} not equal to {}. Actual: {}'.format(
+                    column, expected, actual))
+
+    def assert_latency(self, max_seconds, percentile=99, source=None,
+                       topic=None):
+        """asserts that percentile percent of the signals injected from
+        source and published on topic took at most max_seconds. Needs
+        `measure_latency`.
+        """
+        histogram = self.latency_histogram(source, topic)
+        if not histogram.count:
+            raise AssertionError('No latencies recorded from {} to {}'.format(
+                source or 'any input', topic or 'any topic'))
+        actual = histogram.percentile(percentile)
+        if actual > max_seconds:
+            raise AssertionError(
+                'Latency percentile {} from {} to {} is {:.6f}s, more than '
+                '{}s ({})'.format(percentile, source or 'any input',
+                                  topic or 'any topic', actual, max_seconds,
+                                  histogram))
+
     def assert_signal_published(self, signal_dict, topic=None):
         """asserts signal_dict is in the list of published signals"""
         if topic is None:
@@ -577,3 +1246,7 @@ class NioServiceTestCase(NIOTestCase):
                 # Check next signal
                 continue
         self.fail("Signal has not been published: {}".format(signal_dict))
+
+
+# seconds it took to import this module and its dependencies
+_import_time = monotonic() - _import_start
@@ -0,0 +1,160 @@
+"""Snapshots of a started service's state
+
+A snapshot holds what a service accumulates while it runs: the values blocks
+persist, the jobs waiting in the synchronous scheduler and the signals the
+test captured. Restoring one puts a freshly set up service back into that
+state, so an expensive warm up only has to run once.
+"""
+from collections import namedtuple
+from copy import deepcopy
+import pickle
+import uuid
+
+from .modules.module_scheduler_synchronous.scheduler import QueueEvent
+
+# A scheduled job that calls a method of a service block. Jobs are stored
+# with their block's ID so they can be restored onto new block instances.
+BlockMethod = namedtuple('BlockMethod', 'block_id, method_name')
+# A job as stored in a snapshot, delay is the number of seconds until it
+# fires when the snapshot was taken
+SnapshotJob = namedtuple('SnapshotJob', 'target, delay, frequency, args, '
+                                        'kwargs')
+
+
+def get_persisted_state(block):
+    """The values a block saves to persistence, None if it persists nothing
+    or is mocked"""
+    if not callable(getattr(type(block), 'persisted_values', None)):
+        return None
+    try:
+        return deepcopy(block.persistence_serialize())
+    except NotImplementedError:
+        return {name: deepcopy(getattr(block, name))
+                for name in block.persisted_values() if hasattr(block, name)}
+
+
+def set_persisted_state(block, state):
+    """Put persisted values back on a block, the same way loading them from
+    persistence does"""
+    state = deepcopy(state)
+    try:
+        block.persistence_deserialize(state)
+    except NotImplementedError:
+        for name, value in state.items():
+            setattr(block, name, value)
+
+
+class ServiceSnapshot(object):
+    """The state of a started service at one point in a test
+
+    Attributes:
+        fingerprint (str): hash of the configuration the snapshot was taken
+            with
+        persisted (dict): block ID to the block's persisted values
+        scheduler_offset (float): seconds the scheduler had jumped ahead
+        jobs (list): a SnapshotJob for every scheduled job, soonest first
+        published_signals (dict): topic to published signals
+        processed_signals (dict): block ID to processed signals
+        processed_signals_input (dict): block ID to (input ID, start, end)
+            runs of the block's processed signals
+    """
+
+    def __init__(self, fingerprint, persisted, scheduler_offset=0, jobs=None,
+                 published_signals=None, processed_signals=None,
+                 processed_signals_input=None):
+        self.fingerprint = fingerprint
+        self.persisted = persisted
+        self.scheduler_offset = scheduler_offset
+        self.jobs = jobs or []
+        self.published_signals = published_signals or {}
+        self.processed_signals = processed_signals or {}
+        self.processed_signals_input = processed_signals_input or {}
+
+    def save(self, file_path):
+        """Pickle the snapshot to a file. Signals and the arguments of
+        scheduled jobs must be picklable."""
+        with open(file_path, 'wb') as snapshot_file:
+            pickle.dump(self, snapshot_file)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'rb') as snapshot_file:
+            return pickle.load(snapshot_file)
+
+
+def job_target(target, block_ids):
+    """The portable form of a job target, a BlockMethod when the target is
+    a method of a service block. None for any other target, like closures,
+    partials or methods of a block's helpers, which would still call into
+    the objects of the test the snapshot was taken in."""
+    owner = getattr(target, '__self__', None)
+    if owner is not None and id(owner) in block_ids:
+        return BlockMethod(block_ids[id(owner)], target.__name__)
+    return None
+
+
+def resolve_target(target, blocks):
+    """The block method a stored job calls"""
+    return getattr(blocks[target.block_id], target.method_name)
+
+
+def snapshot_jobs(scheduler, blocks):
+    """A SnapshotJob for every job of a synchronous scheduler that calls a
+    method of a service block. Other jobs are reported and left out.
+
+    Args:
+        scheduler (SynchronousSchedulerRunner): the test's scheduler
+        blocks (dict): service block ID to block
+    """
+    block_ids = {id(block): block_id for block_id, block in blocks.items()}
+    now = scheduler.current_time()
+    jobs = []
+    for event in scheduler.scheduled_events():
+        target = job_target(event.target, block_ids)
+        if target is None:
+            print('Job {} is not a method of a service block, it is left out '
+                  'of the snapshot'.format(event.target))
+            continue
+        jobs.append(SnapshotJob(target, max(event.time - now, 0),
+                                event.frequency, event.args, event.kwargs))
+    return jobs
+
+
+def restore_jobs(scheduler, snapshot, blocks):
+    """Replace the scheduled jobs that call a method of a service block with
+    the snapshot's jobs, and jump the scheduler to the snapshot's offset.
+
+    Jobs a snapshot can't hold, like closures or partials the blocks
+    scheduled when they started, are kept and stay due in as many seconds as
+    before. A block method job that is scheduled again keeps its ID so it
+    can be cancelled as usual.
+
+    Args:
+        scheduler (SynchronousSchedulerRunner): the test's scheduler
+        snapshot (ServiceSnapshot): the snapshot to restore
+        blocks (dict): service block ID to block
+    """
+    block_ids = {id(block): block_id for block_id, block in blocks.items()}
+    # kept jobs are due as many seconds from now as before the offset changes
+    shift = snapshot.scheduler_offset - scheduler.offset
+    scheduler.offset = snapshot.scheduler_offset
+    now = scheduler.current_time()
+    replaced, events = [], []
+    for event in scheduler.scheduled_events():
+        if job_target(event.target, block_ids) is None:
+            events.append(event._replace(time=event.time + shift))
+        else:
+            replaced.append(event)
+    for job in snapshot.jobs:
+        target = resolve_target(job.target, blocks)
+        for event in replaced:
+            if event.target == target:
+                # reuse the ID the block's Job already has
+                replaced.remove(event)
+                event_id = event.id
+                break
+        else:
+            event_id = uuid.uuid4().hex
+        events.append(QueueEvent(now + job.delay, event_id, target,
+                                 job.frequency, job.args, job.kwargs))
+    scheduler.replace_events(events)
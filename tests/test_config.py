@@ -0,0 +1,48 @@
+from copy import deepcopy
+from unittest import TestCase
+
+from ..config import effective_config, replace_env_var, thaw
+
+
+class TestEffectiveConfig(TestCase):
+
+    def setUp(self):
+        self.block_config = {
+            'name': 'block',
+            'nested': {'host': '[[HOST]]', 'items': ['[[HOST]]', 5, None]},
+        }
+        self.overrides = {'extra': {'url': 'http://[[ HOST ]]/'}}
+
+    def test_inputs_unchanged(self):
+        """ Neither the block config nor the overrides are changed """
+        block_config = deepcopy(self.block_config)
+        overrides = deepcopy(self.overrides)
+        _, config = effective_config(
+            self.block_config, self.overrides, {'HOST': 'localhost'})
+        self.assertEqual(self.block_config, block_config)
+        self.assertEqual(self.overrides, overrides)
+        self.assertEqual(config['nested']['host'], 'localhost')
+        self.assertEqual(config['extra']['url'], 'http://localhost/')
+
+    def test_frozen_and_memoized(self):
+        """ The same inputs give the same frozen config, blocks get copies
+        they can change """
+        key, config = effective_config(self.block_config, self.overrides)
+        same_key, same_config = effective_config(
+            deepcopy(self.block_config), deepcopy(self.overrides))
+        self.assertEqual(key, same_key)
+        self.assertIs(config, same_config)
+        with self.assertRaises(TypeError):
+            config['name'] = 'changed'
+        copied = thaw(config)
+        copied['nested']['host'] = 'changed'
+        self.assertEqual(config['nested']['host'], '[[HOST]]')
+        other_key, _ = effective_config(self.block_config, {'name': 'other'})
+        self.assertNotEqual(key, other_key)
+
+    def test_replace_env_var_keeps_list_items(self):
+        """ List items that aren't strings or dicts are kept """
+        config = replace_env_var(self.block_config, 'HOST', 'C:\\host')
+        self.assertEqual(config['nested']['items'], ['C:\\host', 5, None])
+        self.assertEqual(self.block_config['nested']['items'],
+                         ['[[HOST]]', 5, None])
@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+from nio.signal.base import Signal
+
+from ..fixtures import MISSING, SignalBatch
+
+
+class TestSignalBatch(TestCase):
+
+    def test_from_dicts_ragged(self):
+        """ Rows with different keys fill the gaps with MISSING """
+        batch = SignalBatch.from_dicts([{'a': 1}, {'b': 2}, {'a': 3, 'c': 4}])
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.column('a'), [1, MISSING, 3])
+        self.assertEqual(batch.column('b'), [MISSING, 2, MISSING])
+        self.assertEqual(batch.column('c'), [MISSING, MISSING, 4])
+        self.assertEqual([row.to_dict() for row in batch],
+                         [{'a': 1}, {'b': 2}, {'a': 3, 'c': 4}])
+        with self.assertRaises(AttributeError):
+            batch[1].a
+
+    def test_from_signals(self):
+        """ Hidden attributes are left out like Signal.to_dict does """
+        signals = [Signal({'a': 1}), Signal({'a': 2, 'b': 'x'})]
+        signals[0]._hidden = 'hidden'
+        batch = SignalBatch.from_signals(signals)
+        self.assertEqual(batch.columns, ['a', 'b'])
+        self.assertEqual([row.to_dict() for row in batch],
+                         [signal.to_dict() for signal in signals])
+
+    def test_to_signals(self):
+        batch = SignalBatch({'a': [1, MISSING], 'b': ['x', 'y']})
+        signals = batch.to_signals()
+        self.assertTrue(all(isinstance(signal, Signal) for signal in signals))
+        self.assertEqual([signal.to_dict() for signal in signals],
+                         [{'a': 1, 'b': 'x'}, {'b': 'y'}])
+
+    def test_slicing_and_indexing(self):
+        batch = SignalBatch({'a': [0, 1, 2, 3]})
+        self.assertEqual(batch[1:3].column('a'), [1, 2])
+        self.assertEqual(batch[-1].a, 3)
+        with self.assertRaises(IndexError):
+            batch[4]
+
+    def test_invalid_columns(self):
+        with self.assertRaises(ValueError):
+            SignalBatch({'a': [1, 2], 'b': [1]})
+        with self.assertRaises(ValueError):
+            SignalBatch({'': [1]})
@@ -0,0 +1,129 @@
+from unittest import TestCase
+
+from jsonschema import Draft4Validator, Draft7Validator
+
+from ..fuzz import PROFILES, FuzzReport, SchemaSignalGenerator, \
+    ShapeTiming, shrink
+
+SCHEMA = {
+    'definitions': {
+        'reading': {
+            'type': 'object',
+            'properties': {
+                'sensor': {'type': 'string', 'minLength': 1,
+                           'maxLength': 8},
+                'value': {'type': 'number', 'exclusiveMinimum': 0,
+                          'exclusiveMaximum': 1},
+                'count': {'type': 'integer', 'exclusiveMinimum': 0,
+                          'exclusiveMaximum': 3},
+                'tags': {'type': 'array', 'items': {'enum': ['a', 'b']},
+                         'maxItems': 3},
+            },
+            'required': ['sensor', 'value', 'count'],
+            'additionalProperties': False,
+        },
+    },
+    'type': 'object',
+    'properties': {
+        'readings': {'type': 'array', 'items': {
+            '$ref': '#/definitions/reading'}, 'minItems': 1},
+        'kind': {'const': 'reading'},
+        'node': {'$ref': '#/definitions/node'},
+    },
+    'required': ['readings', 'kind'],
+}
+SCHEMA['definitions']['node'] = {
+    'type': 'object',
+    'properties': {'child': {'$ref': '#/definitions/node'}},
+    'additionalProperties': False,
+}
+
+
+class TestSchemaSignalGenerator(TestCase):
+
+    def test_valid_values(self):
+        """ Values follow $ref, required, additionalProperties and exclusive
+        bounds in every profile """
+        generator = SchemaSignalGenerator(SCHEMA, seed=1)
+        validator = Draft7Validator(SCHEMA)
+        for profile in PROFILES:
+            for _ in range(3):
+                value = generator.generate(SCHEMA, profile)
+                validator.validate(value)
+                for reading in value['readings']:
+                    self.assertLessEqual(
+                        set(reading),
+                        {'sensor', 'value', 'count', 'tags'})
+
+    def test_draft4_exclusive_bounds(self):
+        """ Boolean exclusive bounds of draft 4 are respected too """
+        schema = {'type': 'integer', 'minimum': 0, 'maximum': 2,
+                  'exclusiveMinimum': True, 'exclusiveMaximum': True}
+        generator = SchemaSignalGenerator(schema, seed=2)
+        for _ in range(20):
+            value = generator.generate(schema)
+            Draft4Validator(schema).validate(value)
+            self.assertEqual(value, 1)
+
+    def test_same_seed_same_values(self):
+        values = [[SchemaSignalGenerator(SCHEMA, seed=3).generate(
+            SCHEMA, profile) for profile in ('typical', 'deep')]
+            for _ in range(2)]
+        self.assertEqual(values[0], values[1])
+        other = [SchemaSignalGenerator(SCHEMA, seed=4).generate(
+            SCHEMA, profile) for profile in ('typical', 'deep')]
+        self.assertNotEqual(values[0], other)
+
+
+class TestShrink(TestCase):
+
+    def test_minimal_failing_input(self):
+        """ Values that don't matter are removed and the failing value is
+        simplified down to what makes it fail """
+        def fails(values):
+            return any(isinstance(value.get('items'), list) and
+                       3 in value['items'] for value in values)
+
+        values = [{'id': index, 'name': 'signal {}'.format(index),
+                   'items': list(range(index))} for index in range(10)]
+        shrunk = shrink(values, fails)
+        self.assertEqual(shrunk, [{'items': [3]}])
+
+    def test_max_attempts(self):
+        calls = []
+
+        def fails(values):
+            calls.append(values)
+            return True
+
+        values = [{'value': index} for index in range(100)]
+        shrink(values, fails, max_attempts=5)
+        self.assertEqual(len(calls), 5)
+
+
+class TestFuzzReport(TestCase):
+
+    def _report(self, outlier_factor=10):
+        report = FuzzReport('topic', 1, outlier_factor)
+        report.timings.extend([
+            ShapeTiming('typical', 'small', 100, 1),
+            ShapeTiming('typical', 'medium', 100, 1.5),
+            ShapeTiming('huge_lists', 'large', 100, 5),
+        ])
+        return report
+
+    def test_outlier_factor(self):
+        """ Shapes slower than factor times the median are outliers """
+        self.assertEqual(self._report().outliers(), [])
+        self.assertEqual(self._report(3).outliers(),
+                         [('huge_lists', 'large')])
+        self.assertEqual(self._report().outliers(factor=3),
+                         [('huge_lists', 'large')])
+        self.assertIn('OUTLIER', str(self._report(3)))
+        self.assertNotIn('OUTLIER', str(self._report()))
+
+    def test_throughput(self):
+        report = self._report()
+        report.timings.append(ShapeTiming('typical', 'small', 100, 1))
+        self.assertEqual(report.throughput()[('typical', 'small')], 100)
+        self.assertEqual(report.throughput()[('huge_lists', 'large')], 20)
@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+from ..graph import DEFAULT_TERMINAL, ExecutionGraph
+
+
+def execution(*edges, blocks=()):
+    """ An execution with a default terminal connection per (from, to) """
+    receivers = {block_id: [] for block_id in blocks}
+    for from_id, to_id in edges:
+        receivers.setdefault(from_id, []).append(
+            {"id": to_id, "input": DEFAULT_TERMINAL})
+        receivers.setdefault(to_id, [])
+    return [{"id": block_id,
+             "receivers": {DEFAULT_TERMINAL: block_receivers}
+             if block_receivers else {}}
+            for block_id, block_receivers in receivers.items()]
+
+
+class TestExecutionGraph(TestCase):
+
+    def test_chain(self):
+        """ A chain has no problems, an order and a depth """
+        graph = ExecutionGraph(execution(('a', 'b'), ('b', 'c')))
+        self.assertEqual(graph.problems(), [])
+        self.assertEqual(graph.topological_order, ['a', 'b', 'c'])
+        self.assertEqual(graph.depth, {'a': 0, 'b': 1, 'c': 2})
+        self.assertEqual(graph.max_depth, 2)
+        self.assertEqual(graph.fan_out, {'a': 1, 'b': 1, 'c': 0})
+        self.assertEqual(graph.predecessors['c'], ['b'])
+
+    def test_depth_is_longest_path(self):
+        """ Depth follows the longest path to a block """
+        graph = ExecutionGraph(
+            execution(('a', 'b'), ('b', 'c'), ('a', 'c')))
+        self.assertEqual(graph.depth['c'], 2)
+        self.assertEqual(graph.successors['a'], ['b', 'c'])
+
+    def test_cycles(self):
+        """ Cycles, including self loops, are found and left out of the
+        topological order """
+        graph = ExecutionGraph(execution(
+            ('a', 'b'), ('b', 'c'), ('c', 'b'), ('c', 'd'), ('e', 'e')))
+        self.assertEqual(sorted(sorted(cycle) for cycle in graph.cycles),
+                         [['b', 'c'], ['e']])
+        self.assertTrue(graph.in_cycle('b'))
+        self.assertFalse(graph.in_cycle('a'))
+        self.assertEqual(graph.topological_order, ['a'])
+        self.assertNotIn('d', graph.depth)
+        self.assertIn('Blocks form a cycle: e -> e', graph.problems())
+
+    def test_long_cycle(self):
+        """ Cycle detection doesn't recurse, long cycles are found """
+        blocks = ['block{}'.format(index) for index in range(5000)]
+        graph = ExecutionGraph(execution(
+            *zip(blocks, blocks[1:] + blocks[:1])))
+        self.assertEqual(len(graph.cycles), 1)
+        self.assertEqual(sorted(graph.cycles[0]), sorted(blocks))
+
+    def test_dead_blocks(self):
+        """ Unconnected blocks and cycles nothing feeds into are dead """
+        graph = ExecutionGraph(execution(
+            ('a', 'b'), ('c', 'd'), ('d', 'c'), blocks=['lonely']))
+        self.assertEqual(sorted(graph.dead_blocks), ['c', 'd', 'lonely'])
+        self.assertIn('Block lonely can never receive or send signals',
+                      graph.problems())
+
+    def test_missing_receivers(self):
+        """ Receivers that aren't blocks in the service are reported """
+        graph = ExecutionGraph(execution(('a', 'b')), blocks={'a'})
+        self.assertEqual(graph.missing_receivers, [('a', 'b')])
+        self.assertIn('Block a sends signals to b, which is not a block in '
+                      'the service', graph.problems())
+
+    def test_unmatched_terminals(self):
+        """ Terminals a block doesn't define are reported, the default
+        terminal and unknown blocks are not """
+        service_execution = [
+            {"id": "a", "receivers": {
+                "out": [{"id": "b", "input": "left"},
+                        {"id": "b", "input": "middle"}],
+                "missing": [{"id": "c", "input": DEFAULT_TERMINAL}]}},
+            {"id": "b", "receivers": {}},
+            {"id": "c", "receivers": {}},
+        ]
+        terminals = {'a': ({'in'}, {'out'}), 'b': ({'left'}, set())}
+        graph = ExecutionGraph(service_execution, terminals=terminals.get)
+        self.assertEqual(sorted(graph.unmatched_terminals),
+                         [('a', 'output', 'missing'),
+                          ('b', 'input', 'middle')])
+        self.assertIn('Block b has no input terminal middle',
+                      graph.problems())
@@ -0,0 +1,110 @@
+from math import ceil
+import random
+from unittest import TestCase
+
+from nio.signal.base import Signal
+
+from ..latency import INGRESS_ATTRIBUTE, LatencyHistogram, LatencyRecorder
+
+
+def exact_percentile(values, percentile):
+    values = sorted(values)
+    return values[max(ceil(percentile / 100 * len(values)), 1) - 1]
+
+
+class TestLatencyHistogram(TestCase):
+
+    def setUp(self):
+        generator = random.Random(7)
+        # from a thousand units, a millisecond, to a second
+        self.values = [10 ** generator.uniform(-3, 0) for _ in range(5000)]
+
+    def test_percentiles_within_one_percent(self):
+        histogram = LatencyHistogram()
+        for value in self.values:
+            histogram.record(value)
+        for percentile in (1, 10, 50, 90, 99, 99.9):
+            exact = exact_percentile(self.values, percentile)
+            self.assertAlmostEqual(
+                histogram.percentile(percentile) / exact, 1, delta=0.01,
+                msg='p{}'.format(percentile))
+        self.assertEqual(histogram.percentile(100), max(self.values))
+        self.assertEqual(histogram.count, len(self.values))
+        self.assertAlmostEqual(histogram.mean,
+                               sum(self.values) / len(self.values))
+
+    def test_small_values_exact(self):
+        """ Values below the sub bucket count are kept exactly """
+        histogram = LatencyHistogram(unit=1)
+        for value in range(200):
+            histogram.record(value)
+        for percentile in range(1, 100):
+            self.assertEqual(histogram.percentile(percentile),
+                             exact_percentile(range(200), percentile))
+
+    def test_clamped_to_min_and_max(self):
+        """ Bucket midpoints never fall outside the recorded values """
+        histogram = LatencyHistogram()
+        histogram.record(0.123456)
+        for percentile in (0, 50, 99, 100):
+            self.assertEqual(histogram.percentile(percentile), 0.123456)
+        self.assertIsNone(LatencyHistogram().percentile(50))
+        self.assertIsNone(LatencyHistogram().mean)
+
+    def test_merge(self):
+        """ Merging gives the same histogram as recording everything """
+        merged, first, second = (LatencyHistogram() for _ in range(3))
+        for index, value in enumerate(self.values):
+            merged.record(value)
+            (first if index % 2 else second).record(value)
+        first.merge(second)
+        self.assertEqual(first.counts, merged.counts)
+        self.assertEqual(first.count, merged.count)
+        self.assertEqual((first.min, first.max), (merged.min, merged.max))
+        self.assertAlmostEqual(first.total, merged.total)
+        self.assertEqual(first.percentile(50), merged.percentile(50))
+        # merging an empty histogram changes nothing
+        first.merge(LatencyHistogram())
+        self.assertEqual((first.min, first.max), (merged.min, merged.max))
+
+
+class TestLatencyRecorder(TestCase):
+
+    def test_stamped_signals(self):
+        recorder = LatencyRecorder()
+        signals = [Signal({'value': 1}), Signal({'value': 2})]
+        recorder.stamp(signals, 'input')
+        recorder.end_ingress()
+        # the stamp is hidden from to_dict
+        self.assertEqual(signals[0].to_dict(), {'value': 1})
+        self.assertEqual(getattr(signals[0], INGRESS_ATTRIBUTE)[0], 'input')
+        recorder.record(signals, 'output')
+        self.assertEqual(list(recorder.histograms), [('input', 'output')])
+        self.assertEqual(recorder.histogram('input', 'output').count, 2)
+        self.assertEqual(recorder.uncorrelated, {})
+
+    def test_new_signals_count_from_current_ingress(self):
+        """ Signals without a stamp count from the ingress on their thread,
+        or as uncorrelated outside of one """
+        recorder = LatencyRecorder()
+        recorder.stamp([Signal()], 'input')
+        recorder.record([Signal()], 'output')
+        recorder.end_ingress()
+        recorder.record([Signal(), Signal()], 'output')
+        self.assertEqual(recorder.histogram('input').count, 1)
+        self.assertEqual(recorder.uncorrelated, {'output': 2})
+
+    def test_histogram_merges_pairs(self):
+        recorder = LatencyRecorder()
+        for source, topic in (('a', 'x'), ('a', 'y'), ('b', 'x')):
+            signal = Signal()
+            recorder.stamp([signal], source)
+            recorder.end_ingress()
+            recorder.record([signal], topic)
+        self.assertEqual(recorder.histogram().count, 3)
+        self.assertEqual(recorder.histogram('a').count, 2)
+        self.assertEqual(recorder.histogram(topic='x').count, 2)
+        self.assertEqual(recorder.histogram('b', 'y').count, 0)
+        self.assertEqual(len(recorder.to_dict()['pairs']), 3)
+        recorder.clear()
+        self.assertEqual(recorder.histogram().count, 0)
@@ -0,0 +1,69 @@
+from threading import Barrier, Thread
+from time import sleep
+from unittest import TestCase
+
+from ..lazy_blocks import LazyBlocks
+
+
+class TestLazyBlocks(TestCase):
+
+    def setUp(self):
+        self.created = []
+        self.blocks = LazyBlocks(self._create)
+        self.blocks['eager'] = 'eager block'
+        self.blocks.defer('lazy', {'type': 'Lazy'})
+
+    def _create(self, block_id, block_config):
+        self.created.append(block_id)
+        return (block_id, block_config['type'])
+
+    def test_created_when_looked_up(self):
+        """ Deferred blocks are created once, the first time they're used """
+        self.assertEqual(self.created, [])
+        self.assertEqual(self.blocks.pending, ['lazy'])
+        self.assertEqual(self.blocks['lazy'], ('lazy', 'Lazy'))
+        self.assertEqual(self.blocks['lazy'], ('lazy', 'Lazy'))
+        self.assertEqual(self.created, ['lazy'])
+        self.assertEqual(self.blocks.pending, [])
+
+    def test_membership_and_iteration(self):
+        """ Pending blocks are members, but only created ones are iterated """
+        self.assertIn('lazy', self.blocks)
+        self.assertNotIn('other', self.blocks)
+        self.assertEqual(list(self.blocks), ['eager'])
+        self.assertEqual(list(self.blocks.keys()), ['eager'])
+        self.blocks['lazy']
+        self.assertEqual(sorted(self.blocks), ['eager', 'lazy'])
+
+    def test_get(self):
+        self.assertEqual(self.blocks.get('lazy'), ('lazy', 'Lazy'))
+        self.assertIsNone(self.blocks.get('other'))
+        self.assertEqual(self.blocks.get('other', 'default'), 'default')
+        with self.assertRaises(KeyError):
+            self.blocks['other']
+
+    def test_concurrent_lookups(self):
+        """ Threads looking a block up while it is created wait for it
+        instead of raising KeyError """
+        def slow_create(block_id, block_config):
+            self.created.append(block_id)
+            sleep(0.1)
+            return object()
+
+        blocks = LazyBlocks(slow_create)
+        blocks.defer('sink', {})
+        barrier = Barrier(10)
+        found = []
+
+        def look_up():
+            barrier.wait()
+            found.append(blocks['sink'])
+
+        threads = [Thread(target=look_up) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.created, ['sink'])
+        self.assertEqual(len(found), 10)
+        self.assertTrue(all(block is found[0] for block in found))
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from unittest import TestCase
+
+from ..processed import ProcessedInputs, tag_input
+
+
+class TestProcessedInputs(TestCase):
+
+    def setUp(self):
+        self.signals = defaultdict(list)
+        self.tags = defaultdict(list)
+        self.inputs = ProcessedInputs(self.signals, self.tags)
+
+    def _process(self, block_name, signals, input_id=None):
+        """ store signals the way the router does """
+        block_signals = self.signals[block_name]
+        start = len(block_signals)
+        block_signals.extend(signals)
+        tag_input(self.tags[block_name], input_id, start, len(block_signals))
+
+    def test_runs_merge(self):
+        """ Consecutive signals on one input share a run """
+        self._process('block', [1, 2], 'left')
+        self._process('block', [3], 'left')
+        self._process('block', [4], 'right')
+        self._process('block', [], 'right')
+        self._process('block', [5], 'left')
+        self.assertEqual(self.tags['block'], [
+            ['left', 0, 3], ['right', 3, 4], ['left', 4, 5]])
+
+    def test_views(self):
+        """ Views index, count and compare like the lists they replace """
+        self._process('block', [1, 2], 'left')
+        self._process('block', [3], 'right')
+        self._process('block', [4, 5], 'left')
+        self._process('block', [6])
+        left = self.inputs['block']['left']
+        self.assertEqual(len(left), 4)
+        self.assertEqual(left, [1, 2, 4, 5])
+        self.assertEqual(left[0], 1)
+        self.assertEqual(left[2], 4)
+        self.assertEqual(left[-1], 5)
+        self.assertEqual(left[-4], 1)
+        self.assertEqual(left[1:3], [2, 4])
+        with self.assertRaises(IndexError):
+            left[4]
+        with self.assertRaises(IndexError):
+            left[-5]
+        self.assertEqual(self.inputs['block'][None], [6])
+        self.assertEqual(self.inputs.get('block').get('right'), [3])
+        self.assertEqual(self.inputs, {
+            'block': {'left': [1, 2, 4, 5], 'right': [3], None: [6]}})
+
+    def test_views_are_live(self):
+        """ A view taken before signals are processed sees them """
+        view = self.inputs['block']['left']
+        self.assertEqual(len(view), 0)
+        self._process('block', [1], 'left')
+        self.assertEqual(view, [1])
+
+    def test_lookup_adds_nothing(self):
+        """ Looking up blocks and inputs doesn't create entries """
+        self._process('block', [1], 'left')
+        self.assertEqual(self.inputs['other']['left'], [])
+        self.assertEqual(self.inputs['block']['right'], [])
+        self.assertEqual(self.inputs.get('missing', {}).get('left', []), [])
+        self.assertNotIn('other', self.inputs)
+        self.assertNotIn('right', self.inputs['block'])
+        self.assertNotIn(None, self.inputs['block'])
+        self.assertEqual(list(self.inputs), ['block'])
+        self.assertEqual(list(self.inputs['block']), ['left'])
+        self.assertNotIn('other', self.signals)
+        self.assertNotIn('other', self.tags)
+
+    def test_cleared_list(self):
+        """ Clearing or truncating a block's signals drops their runs """
+        self._process('block', [1, 2], 'left')
+        self._process('block', [3], 'right')
+        left = self.inputs['block']['left']
+        del self.signals['block'][1:]
+        self.assertEqual(left, [1])
+        self.assertEqual(self.inputs['block']['right'], [])
+        self._process('block', [4], 'right')
+        self.assertEqual(self.tags['block'], [['left', 0, 1], ['right', 1, 2]])
+        self.assertEqual(self.inputs['block']['right'], [4])
+        self.signals['block'].clear()
+        self._process('block', [5], 'left')
+        self.assertEqual(self.tags['block'], [['left', 0, 1]])
+        self.assertEqual(left, [5])
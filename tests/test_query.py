@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from nio.signal.base import Signal
+
+from ..fixtures import MISSING
+from ..query import SignalView
+
+
+class TestSignalView(TestCase):
+
+    def setUp(self):
+        self.signals = [Signal({'g': index % 3, 'v': index})
+                        for index in range(9)]
+        self.signals.append(Signal({'v': 100}))
+        self.view = SignalView(self.signals)
+
+    def test_filter(self):
+        three = self.view.filter(g=2)
+        self.assertEqual(three.column('v'), [2, 5, 8])
+        self.assertEqual(three.sum('v'), 15)
+        self.assertEqual(
+            self.view.filter(predicate=lambda row: row.v > 6).column('v'),
+            [7, 8, 100])
+        # filters of filtered views keep the right rows
+        self.assertEqual(three.filter(predicate=lambda row: row.v > 2)
+                         .to_dicts(), [{'g': 2, 'v': 5}, {'g': 2, 'v': 8}])
+
+    def test_group_by_missing(self):
+        """ Signals without the attribute are grouped under MISSING """
+        groups = self.view.group_by('g')
+        self.assertEqual(set(groups), {0, 1, 2, MISSING})
+        self.assertEqual(groups[MISSING].column('v'), [100])
+        self.assertEqual(groups[1].column('v'), [1, 4, 7])
+        self.assertEqual(self.view.count_by('g'), {0: 3, 1: 3, 2: 3})
+
+    def test_select(self):
+        selected = self.view.filter(g=0).select('v')
+        self.assertEqual(selected.columns, ['v'])
+        self.assertEqual(selected.to_dicts(), [{'v': 0}, {'v': 3}, {'v': 6}])
+
+    def test_aggregates(self):
+        self.assertEqual(len(self.view), 10)
+        self.assertEqual(self.view.min('v'), 0)
+        self.assertEqual(self.view.max('v'), 100)
+        self.assertEqual(self.view.filter(g=1).mean('v'), 4)
+        self.assertIsNone(self.view.filter(g=5).mean('v'))
+        self.assertEqual(self.view.column('missing'), [])
+
+    def test_copies_signals(self):
+        """ Signals captured after the view is created are not included """
+        self.signals.append(Signal({'v': 1}))
+        self.assertEqual(len(self.view), 10)
+        self.assertEqual(len(self.view.batch), 10)
@@ -0,0 +1,126 @@
+from unittest import TestCase
+
+from nio.router.context import RouterContext
+
+from ..graph import DEFAULT_TERMINAL
+from ..router import ServiceTestRouter
+
+
+class StubBlock(object):
+    """ Records the signals it processes and can notify its own """
+
+    def __init__(self, block_name, log, on_process=None):
+        self._name = block_name
+        self._log = log
+        self.on_process = on_process
+
+    def name(self):
+        return self._name
+
+    def process_signals(self, signals, input_id=None):
+        self._log.append((self._name, input_id, list(signals)))
+        if self.on_process:
+            self.on_process(signals)
+
+
+def receivers(*receiver_ids, input_id=DEFAULT_TERMINAL):
+    return [{"id": receiver_id, "input": input_id}
+            for receiver_id in receiver_ids]
+
+
+class TestRouterDispatchQueue(TestCase):
+
+    def _router(self, execution, dispatch_queue=True, batch_size=0):
+        self.log = []
+        router = ServiceTestRouter(True, dispatch_queue, batch_size)
+        blocks = {service_block["id"]: StubBlock(service_block["id"], self.log)
+                  for service_block in execution}
+        router.configure(RouterContext(execution=execution, blocks=blocks))
+        return router, blocks
+
+    def _forward(self, router, block):
+        """ have a block notify every signal it processes """
+        block.on_process = lambda signals: router.notify_signals(
+            block, signals, DEFAULT_TERMINAL)
+
+    def _tree(self, dispatch_queue):
+        execution = [
+            {"id": "a", "receivers": {DEFAULT_TERMINAL: receivers("b", "c")}},
+            {"id": "b", "receivers": {DEFAULT_TERMINAL: receivers("d")}},
+            {"id": "c", "receivers": {}},
+            {"id": "d", "receivers": {}},
+        ]
+        router, blocks = self._router(execution, dispatch_queue)
+        self._forward(router, blocks["b"])
+        router.notify_signals(blocks["a"], [1], DEFAULT_TERMINAL)
+        return [entry[0] for entry in self.log]
+
+    def test_breadth_first(self):
+        """ Queued deliveries are made in FIFO order, breadth first """
+        self.assertEqual(self._tree(dispatch_queue=True), ["b", "c", "d"])
+
+    def test_depth_first_without_queue(self):
+        """ Without the queue downstream blocks are called recursively """
+        self.assertEqual(self._tree(dispatch_queue=False), ["b", "d", "c"])
+
+    def _source(self, batch_size, notifies):
+        """ a block that notifies each (output, signals) in notifies when
+        it processes signals, outputs lead to b and c """
+        execution = [
+            {"id": "source", "receivers": {
+                DEFAULT_TERMINAL: receivers("a")}},
+            {"id": "a", "receivers": {
+                "b": receivers("b"),
+                "b_right": receivers("b", input_id="right"),
+                "c": receivers("c")}},
+            {"id": "b", "receivers": {}},
+            {"id": "c", "receivers": {}},
+        ]
+        router, blocks = self._router(execution, batch_size=batch_size)
+
+        def notify_all(_):
+            for output_id, signals in notifies:
+                router.notify_signals(blocks["a"], signals, output_id)
+        blocks["a"].on_process = notify_all
+        router.notify_signals(blocks["source"], [0], DEFAULT_TERMINAL)
+        return self.log[1:]
+
+    def test_merge_consecutive_within_batch_size(self):
+        """ Consecutive deliveries to one block input merge up to
+        batch_size signals """
+        self.assertEqual(
+            self._source(2, [("b", [1]), ("b", [2]), ("b", [3])]),
+            [("b", None, [1, 2]), ("b", None, [3])])
+
+    def test_no_merge_across_blocks_or_inputs(self):
+        """ Deliveries to another block or input in between don't merge """
+        self.assertEqual(
+            self._source(10, [("b", [1]), ("c", [2]), ("b", [3]),
+                              ("b_right", [4])]),
+            [("b", None, [1]), ("c", None, [2]), ("b", None, [3]),
+             ("b", "right", [4])])
+
+    def test_no_merge_without_batch_size(self):
+        """ A batch size of 0 never merges """
+        self.assertEqual(
+            self._source(0, [("b", [1]), ("b", [2])]),
+            [("b", None, [1]), ("b", None, [2])])
+
+    def test_queue_cleared_when_block_raises(self):
+        """ A raising block leaves no deliveries queued for later """
+        execution = [
+            {"id": "a", "receivers": {DEFAULT_TERMINAL: receivers("b", "c")}},
+            {"id": "b", "receivers": {}},
+            {"id": "c", "receivers": {}},
+        ]
+        router, blocks = self._router(execution)
+
+        def fail(_):
+            raise ValueError("processing failed")
+        blocks["b"].on_process = fail
+        with self.assertRaises(ValueError):
+            router.notify_signals(blocks["a"], [1], DEFAULT_TERMINAL)
+        self.assertEqual([entry[0] for entry in self.log], ["b"])
+        blocks["b"].on_process = None
+        router.notify_signals(blocks["a"], [2], DEFAULT_TERMINAL)
+        self.assertEqual(self.log[1:], [("b", None, [2]), ("c", None, [2])])
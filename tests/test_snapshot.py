@@ -0,0 +1,84 @@
+from collections import namedtuple
+from datetime import timedelta
+from functools import partial
+from unittest import TestCase
+
+from ..modules.module_scheduler_synchronous.scheduler import \
+    SynchronousSchedulerRunner
+from ..snapshot import ServiceSnapshot, restore_jobs, snapshot_jobs
+
+Context = namedtuple('Context', 'min_interval, resolution')
+
+
+class TickBlock(object):
+    """ Schedules a block method job and a partial job when started """
+
+    def __init__(self, scheduler):
+        self.ticks = []
+        self.polls = 0
+        scheduler.schedule_task(self.poll, timedelta(seconds=5), True)
+        scheduler.schedule_task(partial(self._tick, 1), timedelta(seconds=10), True)
+
+    def poll(self):
+        self.polls += 1
+
+    def _tick(self, value):
+        self.ticks.append(value)
+
+
+def _scheduler():
+    scheduler = SynchronousSchedulerRunner(background=False)
+    scheduler.do_configure(Context(0.01, 0.01))
+    scheduler.do_start()
+    return scheduler
+
+
+class TestSnapshotJobs(TestCase):
+
+    def setUp(self):
+        self.scheduler = _scheduler()
+        self.blocks = {'block': TickBlock(self.scheduler)}
+
+    def tearDown(self):
+        self.scheduler.do_stop()
+
+    def _restored(self):
+        """ a snapshot taken after 2 seconds, restored into a new test """
+        self.scheduler.jump_ahead(2)
+        snapshot = ServiceSnapshot(
+            'fingerprint', {}, self.scheduler.offset,
+            snapshot_jobs(self.scheduler, self.blocks))
+        scheduler = _scheduler()
+        self.addCleanup(scheduler.do_stop)
+        blocks = {'block': TickBlock(scheduler)}
+        restore_jobs(scheduler, snapshot, blocks)
+        return scheduler, blocks['block']
+
+    def test_only_block_methods_kept(self):
+        """ Jobs that aren't block methods are left out of snapshots """
+        jobs = snapshot_jobs(self.scheduler, self.blocks)
+        self.assertEqual([(job.target, job.frequency) for job in jobs],
+                         [(('block', 'poll'), 5)])
+
+    def test_block_method_job_replaced(self):
+        """ A block method job is due when it was in the snapshot, with the
+        ID the new block's job has """
+        scheduler, block = self._restored()
+        poll_ids = [job.id for job in scheduler.pending_jobs()
+                    if job.target == block.poll]
+        self.assertEqual(len(poll_ids), 1)
+        scheduler.jump_ahead(2.9)
+        self.assertEqual(block.polls, 0)
+        executions = scheduler.jump_ahead(0.2)
+        self.assertEqual(block.polls, 1)
+        self.assertEqual([execution.id for execution in executions],
+                         poll_ids)
+
+    def test_other_jobs_kept(self):
+        """ Jobs of the new blocks that a snapshot can't hold keep firing
+        after a restore """
+        scheduler, block = self._restored()
+        self.assertEqual(len(scheduler.pending_jobs()), 2)
+        scheduler.jump_ahead(30)
+        self.assertEqual(block.ticks, [1, 1, 1])
+        self.assertEqual(self.blocks['block'].ticks, [])
@@ -0,0 +1,90 @@
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from ..timing_db import TimingDatabase, main, mann_whitney_p
+
+BASELINE = [1.0, 1.1, 0.9, 1.05, 0.95, 1.02, 0.98, 1.01]
+
+
+class TestMannWhitney(TestCase):
+
+    def test_clear_regression(self):
+        slower = [value * 2 for value in BASELINE]
+        self.assertLess(mann_whitney_p(BASELINE, slower), 0.01)
+        # only current values being larger counts
+        self.assertGreater(mann_whitney_p(slower, BASELINE), 0.99)
+
+    def test_no_difference(self):
+        self.assertAlmostEqual(mann_whitney_p(BASELINE, BASELINE), 0.5)
+        self.assertGreater(
+            mann_whitney_p(BASELINE, list(reversed(BASELINE))), 0.05)
+
+
+class TestTimingDatabase(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'timings.db')
+        self.database = TimingDatabase(self.path)
+        self.addCleanup(self.database.close)
+
+    def _record(self, git_commit, test_id, wall_times):
+        for wall_time in wall_times:
+            self.database.record(test_id, service='service',
+                                 git_commit=git_commit, wall_time=wall_time,
+                                 process_times={'block': wall_time / 2})
+
+    def _main(self, *args):
+        output = StringIO()
+        with redirect_stdout(output):
+            main([self.path] + list(args))
+        return output.getvalue()
+
+    def test_regressions(self):
+        """ Only the test that got slower is reported """
+        self._record('aaaa1111', 'slower', BASELINE)
+        self._record('aaaa1111', 'same', BASELINE)
+        self._record('bbbb2222', 'slower', [value * 2 for value in BASELINE])
+        self._record('bbbb2222', 'same', BASELINE)
+        regressed = self.database.regressions('aaaa')
+        self.assertEqual([regression[0] for regression in regressed],
+                         ['slower'])
+        self.assertAlmostEqual(regressed[0][1], 1.005)
+        self.assertAlmostEqual(regressed[0][2], 2.01)
+        self.assertIn('slower', self._main('regressions', '--baseline',
+                                           'aaaa', '--commit', 'bbbb'))
+
+    def test_no_regressions(self):
+        self._record('aaaa1111', 'same', BASELINE)
+        self._record('bbbb2222', 'same', BASELINE)
+        self.assertEqual(self.database.regressions('aaaa'), [])
+        self.assertEqual(self._main('regressions', '--baseline', 'aaaa'),
+                         'No significant regressions\n')
+
+    def test_regressions_without_commit(self):
+        """ Without a commit to check it is reported instead of crashing """
+        self._record(None, 'test', BASELINE)
+        with self.assertRaises(ValueError):
+            self.database.regressions('aaaa')
+        error = StringIO()
+        with redirect_stderr(error), self.assertRaises(SystemExit):
+            main([self.path, 'regressions', '--baseline', 'aaaa'])
+        self.assertIn('No test runs with a git commit', error.getvalue())
+
+    def test_reports(self):
+        self._record('aaaa1111', 'fast', [1, 1])
+        self._record('aaaa1111', 'slow', [3, 5])
+        self.assertEqual(self.database.slowest_tests(),
+                         [('slow', 4, 2), ('fast', 1, 2)])
+        self.assertEqual([row[2] for row in self.database.trend('slow')],
+                         [3, 5])
+        self.assertEqual(self.database.slowest_blocks(),
+                         [('service', 'block', 1.25, None)])
+        output = self._main('slowest')
+        self.assertLess(output.index('slow'), output.index('fast'))
+        self.assertIn('service block', self._main('blocks'))
+        self.assertEqual(len(self._main('trend', 'slow').splitlines()), 2)
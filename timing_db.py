@@ -0,0 +1,266 @@
+"""Timing database for service tests
+
+Service tests can append their timings to a local SQLite file so that slow
+creep can be spotted across runs. Run this module to report on a database:
+
+    python service_tests/timing_db.py timings.db slowest
+    python service_tests/timing_db.py timings.db blocks
+    python service_tests/timing_db.py timings.db trend tests.test_example
+    python service_tests/timing_db.py timings.db regressions --baseline abc123
+"""
+import argparse
+from collections import defaultdict
+from functools import lru_cache
+from math import erf, sqrt
+import os
+import sqlite3
+import subprocess
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_runs (
+    id INTEGER PRIMARY KEY,
+    test_id TEXT NOT NULL,
+    service TEXT,
+    git_commit TEXT,
+    recorded_at REAL NOT NULL,
+    setup_time REAL,
+    block_setup_time REAL,
+    wall_time REAL,
+    signals_processed INTEGER,
+    signals_published INTEGER
+);
+CREATE TABLE IF NOT EXISTS block_times (
+    run_id INTEGER NOT NULL REFERENCES test_runs(id),
+    block TEXT NOT NULL,
+    configure_time REAL,
+    process_time REAL
+);
+CREATE INDEX IF NOT EXISTS test_runs_test ON test_runs (test_id);
+CREATE INDEX IF NOT EXISTS test_runs_commit ON test_runs (git_commit);
+"""
+
+
+@lru_cache()
+def current_commit(directory=None):
+    """The git commit checked out in directory, None if not in a repo"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=directory,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def mann_whitney_p(baseline, current):
+    """One sided p-value that current values tend to be larger than the
+    baseline values, from a Mann-Whitney U test with normal approximation.
+    """
+    values = sorted([(value, 0) for value in baseline] +
+                    [(value, 1) for value in current])
+    # rank values, ties get the average of their ranks
+    ranks = [0] * len(values)
+    index = 0
+    while index < len(values):
+        end = index
+        while end + 1 < len(values) and \
+                values[end + 1][0] == values[index][0]:
+            end += 1
+        for tied in range(index, end + 1):
+            ranks[tied] = (index + end) / 2 + 1
+        index = end + 1
+    n1, n2 = len(baseline), len(current)
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, values) if group)
+    u = rank_sum - n2 * (n2 + 1) / 2
+    mean = n1 * n2 / 2
+    deviation = sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    if not deviation:
+        return 1.0
+    z = (u - mean) / deviation
+    return 1 - (1 + erf(z / sqrt(2))) / 2
+
+
+class TimingDatabase(object):
+    """A SQLite file of service test timings
+
+    Args:
+        path (str): the database file, created if it doesn't exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def record(self, test_id, service=None, git_commit=None, setup_time=None,
+               block_setup_time=None, wall_time=None, signals_processed=None,
+               signals_published=None, configure_times=None,
+               process_times=None):
+        """Add the timings of one test run
+
+        Args:
+            configure_times (dict): block to seconds spent configuring it
+            process_times (dict): block to seconds spent processing signals
+        """
+        configure_times = configure_times or {}
+        process_times = process_times or {}
+        with self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO test_runs (test_id, service, git_commit, '
+                'recorded_at, setup_time, block_setup_time, wall_time, '
+                'signals_processed, signals_published) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (test_id, service, git_commit, time.time(), setup_time,
+                 block_setup_time, wall_time, signals_processed,
+                 signals_published))
+            self._connection.executemany(
+                'INSERT INTO block_times VALUES (?, ?, ?, ?)',
+                [(cursor.lastrowid, str(block), configure_times.get(block),
+                  process_times.get(block))
+                 for block in set(configure_times) | set(process_times)])
+
+    def trend(self, test_id, limit=20):
+        """The most recent runs of a test, oldest first, as (recorded_at,
+        git_commit, wall_time, setup_time) rows"""
+        rows = self._connection.execute(
+            'SELECT recorded_at, git_commit, wall_time, setup_time '
+            'FROM test_runs WHERE test_id = ? '
+            'ORDER BY recorded_at DESC LIMIT ?', (test_id, limit)).fetchall()
+        return list(reversed(rows))
+
+    def slowest_tests(self, limit=10):
+        """(test_id, average wall time, runs), slowest first"""
+        return self._connection.execute(
+            'SELECT test_id, AVG(wall_time), COUNT(*) FROM test_runs '
+            'GROUP BY test_id ORDER BY AVG(wall_time) DESC LIMIT ?',
+            (limit,)).fetchall()
+
+    def slowest_blocks(self, limit=10):
+        """(service, block, average process time, average configure time),
+        slowest processing first"""
+        return self._connection.execute(
+            'SELECT test_runs.service, block, AVG(process_time), '
+            'AVG(configure_time) FROM block_times '
+            'JOIN test_runs ON test_runs.id = block_times.run_id '
+            'GROUP BY test_runs.service, block '
+            'ORDER BY AVG(process_time) DESC LIMIT ?', (limit,)).fetchall()
+
+    def _wall_times(self, git_commit):
+        """wall times per test on a commit, which may be abbreviated"""
+        times = defaultdict(list)
+        for test_id, wall_time in self._connection.execute(
+                'SELECT test_id, wall_time FROM test_runs '
+                'WHERE git_commit LIKE ?', (git_commit + '%',)):
+            times[test_id].append(wall_time)
+        return times
+
+    def latest_commit(self):
+        row = self._connection.execute(
+            'SELECT git_commit FROM test_runs WHERE git_commit IS NOT NULL '
+            'ORDER BY recorded_at DESC LIMIT 1').fetchone()
+        return row[0] if row else None
+
+    def regressions(self, baseline_commit, git_commit=None, alpha=0.05,
+                    min_runs=3):
+        """Tests that got significantly slower than on a baseline commit
+
+        Args:
+            baseline_commit (str): the commit to compare against
+            git_commit (str): the commit to check, defaults to the commit of
+                the most recent run
+            alpha (float): significance level
+            min_runs (int): tests with fewer runs on either commit are not
+                compared
+
+        Returns:
+            list: (test_id, baseline median, median, p-value) for every test
+                that regressed, smallest p-value first
+
+        Raises:
+            ValueError: without git_commit, if no run has a git commit
+        """
+        git_commit = git_commit or self.latest_commit()
+        if git_commit is None:
+            raise ValueError('No test runs with a git commit to check')
+        baseline = self._wall_times(baseline_commit)
+        current = self._wall_times(git_commit)
+        regressed = []
+        for test_id, times in current.items():
+            baseline_times = baseline.get(test_id, [])
+            if len(times) < min_runs or len(baseline_times) < min_runs:
+                continue
+            p_value = mann_whitney_p(baseline_times, times)
+            if p_value < alpha:
+                regressed.append((test_id, _median(baseline_times),
+                                  _median(times), p_value))
+        return sorted(regressed, key=lambda regression: regression[3])
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Report on service test timings')
+    parser.add_argument('database', help='path to the timing database')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    slowest = commands.add_parser('slowest', help='slowest tests')
+    slowest.add_argument('--limit', type=int, default=10)
+    blocks = commands.add_parser('blocks', help='slowest blocks')
+    blocks.add_argument('--limit', type=int, default=10)
+    trend = commands.add_parser('trend', help='recent runs of a test')
+    trend.add_argument('test_id')
+    trend.add_argument('--limit', type=int, default=20)
+    regressions = commands.add_parser(
+        'regressions', help='tests significantly slower than a baseline')
+    regressions.add_argument('--baseline', required=True,
+                             help='commit to compare against')
+    regressions.add_argument('--commit',
+                             help='commit to check, defaults to the latest')
+    regressions.add_argument('--alpha', type=float, default=0.05)
+    args = parser.parse_args(args)
+
+    if not os.path.isfile(args.database):
+        parser.error('No timing database at {}'.format(args.database))
+    database = TimingDatabase(args.database)
+    if args.command == 'slowest':
+        for test_id, wall_time, runs in database.slowest_tests(args.limit):
+            print('{:10.4f}s  {:5d} runs  {}'.format(wall_time, runs, test_id))
+    elif args.command == 'blocks':
+        for service, block, process_time, configure_time in \
+                database.slowest_blocks(args.limit):
+            print('{:10.4f}s processing {:10.4f}s configuring  {} {}'.format(
+                process_time or 0, configure_time or 0, service, block))
+    elif args.command == 'trend':
+        for recorded_at, git_commit, wall_time, setup_time in \
+                database.trend(args.test_id, args.limit):
+            print('{}  {:.8}  {:10.4f}s  setup {:.4f}s'.format(
+                time.strftime('%Y-%m-%d %H:%M:%S',
+                              time.localtime(recorded_at)),
+                git_commit or '-', wall_time or 0, setup_time or 0))
+    else:
+        try:
+            regressed = database.regressions(
+                args.baseline, args.commit, args.alpha)
+        except ValueError as error:
+            database.close()
+            parser.error(str(error))
+        for test_id, baseline_median, median, p_value in regressed:
+            print('{}  {:.4f}s -> {:.4f}s  p={:.4f}'.format(
+                test_id, baseline_median, median, p_value))
+        if not regressed:
+            print('No significant regressions')
+    database.close()
+
+
+if __name__ == '__main__':
+    main()
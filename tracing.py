@@ -0,0 +1,111 @@
+"""Signal flow tracing for service tests
+
+The router records one `Hop` for every delivery of signals from one block to
+another. Hops are kept in a fixed size ring buffer so tracing can stay on in
+large tests, and can be exported as Chrome trace-event JSON to be opened in
+Perfetto or chrome://tracing.
+"""
+from collections import deque, namedtuple
+from itertools import count
+import json
+from threading import get_ident, local
+from time import monotonic
+
+Hop = namedtuple('Hop', 'trace_id, from_block, to_block, input_id, '
+                        'batch_size, clone_start, clone_time, clone_thread, '
+                        'process_start, process_time, process_thread')
+
+
+class SignalTracer(object):
+    """Records block to block signal deliveries
+
+    Every notify that doesn't happen while another traced delivery is being
+    processed on the same thread starts a new trace. Deliveries caused by it
+    share its trace ID, so a trace follows signals through the service.
+
+    Args:
+        capacity (int): how many hops to keep, older hops are dropped
+    """
+
+    def __init__(self, capacity=10000):
+        self.hops = deque(maxlen=capacity)
+        self._trace_ids = count(1)
+        self._current = local()
+        self._origin = monotonic()
+
+    def start_trace(self):
+        """Return the trace ID for a notify on this thread, a new one if
+        the notify is not part of an existing trace"""
+        trace_id = getattr(self._current, 'trace_id', None)
+        if trace_id is None:
+            trace_id = next(self._trace_ids)
+        return trace_id
+
+    def traced(self, process_signals, trace_id, from_block, to_block,
+               input_id, batch_size, clone_start, clone_time):
+        """Wrap a block's process_signals to record a hop when it is called.
+
+        The wrapper can be called on any thread, downstream notifies on that
+        thread become part of the same trace.
+        """
+        clone_thread = get_ident()
+
+        def traced_process_signals(*args, **kwargs):
+            parent_trace_id = getattr(self._current, 'trace_id', None)
+            self._current.trace_id = trace_id
+            process_start = monotonic()
+            try:
+                return process_signals(*args, **kwargs)
+            finally:
+                self._current.trace_id = parent_trace_id
+                self.hops.append(Hop(
+                    trace_id, from_block, to_block, input_id, batch_size,
+                    clone_start, clone_time, clone_thread,
+                    process_start, monotonic() - process_start, get_ident()))
+        return traced_process_signals
+
+    def clear(self):
+        self.hops.clear()
+
+    def to_chrome_trace(self):
+        """Return the recorded hops in Chrome trace-event format.
+
+        Each hop is a complete event on the thread that processed it, with
+        an event for the time spent cloning the signals on the thread that
+        notified them.
+        """
+        events = []
+        for hop in self.hops:
+            args = {
+                'trace_id': hop.trace_id,
+                'from_block': hop.from_block,
+                'to_block': hop.to_block,
+                'input_id': hop.input_id,
+                'batch_size': hop.batch_size,
+            }
+            events.append({
+                'name': '{} -> {}'.format(hop.from_block, hop.to_block),
+                'cat': 'signals',
+                'ph': 'X',
+                'ts': (hop.process_start - self._origin) * 1e6,
+                'dur': hop.process_time * 1e6,
+                'pid': 1,
+                'tid': hop.process_thread,
+                'args': args,
+            })
+            events.append({
+                'name': 'clone',
+                'cat': 'clone',
+                'ph': 'X',
+                'ts': (hop.clone_start - self._origin) * 1e6,
+                'dur': hop.clone_time * 1e6,
+                'pid': 1,
+                'tid': hop.clone_thread,
+                'args': {'trace_id': hop.trace_id},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, file_path):
+        """Write the Chrome trace-event JSON to a file"""
+        with open(file_path, 'w') as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)